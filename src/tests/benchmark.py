@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+'''
+Benchmark suite of thread_utils.
+
+Run "python benchmark.py --help" for the options. The results are written in
+JSON so that they can be compared between commits:
+
+    python benchmark.py --output before.json
+    (change the code)
+    python benchmark.py --output after.json --compare before.json
+
+thread_utils.Pool and thread_utils.async are compared with
+concurrent.futures.ThreadPoolExecutor if it is available.
+'''
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import thread_utils
+
+try:
+    import concurrent.futures
+except ImportError:
+    # Python 2 without "futures" package.
+    concurrent = None
+
+
+# Task kinds.
+def noop():
+    pass
+
+
+def io_bound():
+    time.sleep(0.001)
+
+
+def gil_bound():
+    sum(xrange(1000))
+
+
+def now():
+    return time.time()
+
+
+def sleep_and_now(n):
+    time.sleep(n)
+    return time.time()
+
+
+TASKS = {'noop': noop, 'io': io_bound, 'gil': gil_bound}
+
+
+# Executors. Each of them has submit, result and shutdown method.
+class PoolExecutor(object):
+    name = 'Pool'
+    has_workers = True
+
+    def __init__(self, workers):
+        self.pool = thread_utils.Pool(worker_size=workers)
+
+    def submit(self, func, *args):
+        return self.pool.send(func, *args)
+
+    @staticmethod
+    def result(future, timeout=None):
+        return future.receive(timeout)
+
+    def shutdown(self):
+        self.pool.kill(block=True)
+
+
+class AsyncExecutor(object):
+    '''
+    thread_utils.async creates a thread per a call; argument workers is
+    ignored.
+    '''
+
+    name = 'async'
+    cached = False
+    has_workers = False
+
+    def __init__(self, workers):
+        self.funcs = {}
+
+    def submit(self, func, *args):
+        try:
+            f = self.funcs[func]
+        except KeyError:
+            f = self.funcs[func] = thread_utils.async(cached=self.cached)(func)
+        return f(*args)
+
+    result = staticmethod(PoolExecutor.result)
+
+    def shutdown(self):
+        pass
+
+
+class CachedAsyncExecutor(AsyncExecutor):
+    name = 'async(cached)'
+    cached = True
+
+
+class ThreadPoolExecutor(object):
+    name = 'ThreadPoolExecutor'
+    has_workers = True
+
+    def __init__(self, workers):
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+
+    def submit(self, func, *args):
+        return self.executor.submit(func, *args)
+
+    @staticmethod
+    def result(future, timeout=None):
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            raise thread_utils.TimeoutError
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+EXECUTORS = [PoolExecutor, AsyncExecutor, CachedAsyncExecutor]
+if concurrent is not None:
+    EXECUTORS.append(ThreadPoolExecutor)
+
+
+def percentiles(samples):
+    ''' Return the summary of `samples' in microseconds. '''
+
+    samples = sorted(samples)
+
+    def at(p):
+        return round(samples[min(len(samples) - 1,
+                                 int(len(samples) * p))] * 1e6, 1)
+
+    return {'p50_us': at(0.5), 'p90_us': at(0.9), 'p99_us': at(0.99),
+            'max_us': at(1.0)}
+
+
+# Benchmarks. Each of them takes an executor and the options, and returns a
+# dict of the results.
+def bench_submit(executor, args):
+    '''
+    How many no-op tasks can be submitted per second. The time to finish the
+    tasks is not included.
+    '''
+
+    count = args.tasks
+    start = time.time()
+    futures = [executor.submit(noop) for i in xrange(count)]
+    elapsed = time.time() - start
+
+    for f in futures:
+        executor.result(f)
+
+    return {'tasks': count, 'seconds': round(elapsed, 6),
+            'tasks_per_second': round(count / elapsed, 1)}
+
+
+def bench_latency(executor, args):
+    '''
+    Latency from the submission of a no-op task until the result is
+    received, one task at a time.
+    '''
+
+    samples = []
+    for i in xrange(args.samples):
+        start = time.time()
+        executor.result(executor.submit(noop))
+        samples.append(time.time() - start)
+
+    return percentiles(samples)
+
+
+def bench_wakeup(executor, args):
+    '''
+    Latency from the end of a task until the thread blocking in receive method
+    wakes up.
+    '''
+
+    samples = []
+    for i in xrange(args.samples // 10):
+        # Make sure that the receiver is blocking before the task finishes.
+        finished_at = executor.result(executor.submit(sleep_and_now, 0.001))
+        samples.append(time.time() - finished_at)
+
+    return percentiles(samples)
+
+
+def bench_receive_timeout(executor, args):
+    '''
+    How much receive(timeout) oversleeps for a task which doesn't finish in
+    time.
+    '''
+
+    timeout = 0.01
+    samples = []
+    futures = []
+    for i in xrange(args.samples // 100):
+        f = executor.submit(time.sleep, timeout * 5)
+        futures.append(f)
+
+        start = time.time()
+        try:
+            executor.result(f, timeout)
+        except thread_utils.TimeoutError:
+            pass
+        samples.append(time.time() - start - timeout)
+
+    for f in futures:
+        executor.result(f)
+
+    return percentiles(samples)
+
+
+def bench_scaling(executor, args):
+    '''
+    Throughput of each task kind for each worker size.
+    '''
+
+    ret = {}
+    for kind in sorted(TASKS):
+        func = TASKS[kind]
+        count = args.tasks if kind != 'io' else args.tasks // 10
+
+        start = time.time()
+        futures = [executor.submit(func) for i in xrange(count)]
+        for f in futures:
+            executor.result(f)
+        elapsed = time.time() - start
+
+        ret[kind] = {'tasks': count, 'seconds': round(elapsed, 6),
+                     'tasks_per_second': round(count / elapsed, 1)}
+
+    return ret
+
+
+BENCHMARKS = [('submit', bench_submit, False),
+              ('latency', bench_latency, False),
+              ('wakeup', bench_wakeup, False),
+              ('receive_timeout', bench_receive_timeout, False),
+              ('scaling', bench_scaling, True)]
+
+
+def rss():
+    ''' Return the current resident set size in bytes. '''
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except IOError:
+        # The peak RSS instead. (KB on Linux, bytes on Mac OS X.)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def bench_footprint(args):
+    '''
+    Memory footprint of a pending future of Pool. No worker runs them.
+    '''
+
+    # Too few objects don't change RSS.
+    count = max(args.tasks, 65535)
+    pool = thread_utils.Pool(worker_size=0)
+
+    gc.collect()
+    before = rss()
+    futures = [pool.send(noop) for i in xrange(count)]
+    gc.collect()
+    after = rss()
+
+    ret = {'getsizeof_bytes': sys.getsizeof(futures[0]),
+           'rss_bytes_per_future': round(float(after - before) / count, 1)}
+
+    pool.cancel()
+    pool.kill(block=True)
+    return ret
+
+
+def git_revision():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], stderr=devnull,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    results = {}
+
+    for name, bench, scaling in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+
+        for executor_class in EXECUTORS:
+            if scaling and executor_class.has_workers:
+                workers_list = args.workers
+            else:
+                workers_list = [max(args.workers)]
+
+            for workers in workers_list:
+                key = '%s/%s/%d' % (name, executor_class.name, workers)
+                sys.stderr.write('%s ...\n' % key)
+
+                executor = executor_class(workers)
+                try:
+                    results[key] = bench(executor, args)
+                finally:
+                    executor.shutdown()
+
+    if not args.only or 'footprint' in args.only:
+        sys.stderr.write('footprint ...\n')
+        results['footprint/Pool'] = bench_footprint(args)
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'revision': git_revision(),
+            'tasks': args.tasks,
+            'samples': args.samples,
+            'workers': args.workers,
+        },
+        'results': results,
+    }
+
+
+def flatten(results, prefix=''):
+    ''' Yield (key, number) pairs of nested dict `results'. '''
+
+    for k in sorted(results):
+        v = results[k]
+        if isinstance(v, dict):
+            for pair in flatten(v, prefix + k + '/'):
+                yield pair
+        else:
+            yield (prefix + k, v)
+
+
+def compare(old, new):
+    '''
+    Print the ratio of each value in `new' to the same value in `old'.
+    '''
+
+    old_values = dict(flatten(old['results']))
+    for key, value in flatten(new['results']):
+        base = old_values.get(key)
+        if not base:
+            continue
+        sys.stdout.write('%-60s %12s -> %12s (%+.1f%%)\n' %
+                         (key, base, value,
+                          (float(value) / base - 1.0) * 100))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark thread_utils.')
+    parser.add_argument('--tasks', type=int, default=20000,
+                        help='tasks per a throughput measurement')
+    parser.add_argument('--samples', type=int, default=2000,
+                        help='samples per a latency measurement')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16],
+                        help='worker sizes for the scaling benchmark')
+    parser.add_argument('--only', nargs='+',
+                        choices=[b[0] for b in BENCHMARKS] + ['footprint'],
+                        help='run only the specified benchmarks')
+    parser.add_argument('--quick', action='store_true',
+                        help='run with small numbers to check the suite')
+    parser.add_argument('--output', help='write the results to the file '
+                        'instead of stdout')
+    parser.add_argument('--compare', help='print the ratio to the results '
+                        'in the file')
+
+    args = parser.parse_args()
+    if args.quick:
+        args.tasks = 1000
+        args.samples = 200
+        args.workers = [1, 4]
+
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = run(args)
+
+    dumped = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(dumped + '\n')
+    elif not args.compare:
+        sys.stdout.write(dumped + '\n')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import threading
+
+import thread_utils
+
+asyncio = pytest.importorskip('asyncio')
+
+
+TEST_INTERVAL = 0.1
+
+
+class TestWrapFuture(object):
+    """
+    Future objects of thread_utils can be used in asyncio event loop.
+    """
+
+    def setup_method(self, method):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.p = thread_utils.Pool()
+
+    def teardown_method(self, method):
+        self.p.kill()
+        self.loop.close()
+
+    def test_wrap_pool_future(self):
+        """
+        wrap_future returns asyncio.Future of the result of PoolFuture.
+        """
+
+        f = thread_utils.wrap_future(self.p.send(abs, -1), loop=self.loop)
+        assert self.loop.run_until_complete(f) == 1
+
+        f = thread_utils.wrap_future(self.p.send(int, 'foo'), loop=self.loop)
+        with pytest.raises(ValueError):
+            self.loop.run_until_complete(f)
+
+    def test_wrap_async_future(self):
+        """
+        wrap_future returns asyncio.Future of the result of AsyncFuture.
+        """
+
+        event = threading.Event()
+
+        @thread_utils.async()
+        def foo():
+            event.wait()
+            return threading.current_thread()
+
+        f = thread_utils.wrap_future(foo(), loop=self.loop)
+        self.loop.call_later(TEST_INTERVAL, event.set)
+        assert self.loop.run_until_complete(f) is not \
+            threading.current_thread()
+
+    def test_run_in_pool(self):
+        """
+        run_in_pool sends the callable to the pool and returns asyncio.Future.
+        """
+
+        f = thread_utils.run_in_pool(self.p, pow, 2, 10)
+        assert self.loop.run_until_complete(f) == 1024
+
+    def test_future_is_awaitable(self):
+        """
+        Future objects of thread_utils are awaitable.
+        """
+
+        if not hasattr(asyncio.Future, '__await__'):
+            pytest.skip("await is not available.")
+
+        future = self.p.send(abs, -1)
+        assert self.loop.run_until_complete(asyncio.ensure_future(
+            _Awaiter(future), loop=self.loop)) == 1
+
+
+class _Awaiter(object):
+    # Awaitable delegating to a thread_utils Future, to test __await__ without
+    # coroutine syntax.
+
+    def __init__(self, future):
+        self.future = future
+
+    def __await__(self):
+        return self.future.__await__()
@@ -250,3 +250,197 @@ def test_is_finished_returns_whether_task_is_finished_or_not():
     event.set()
     time.sleep(TEST_INTERVAL)
     assert f.is_finished()
+
+
+def test_add_done_callback_is_invoked_when_task_is_finished():
+    """
+    Future.add_done_callback invokes the callback once when the task is
+    finished.
+    """
+
+    results = []
+
+    @thread_utils.async()
+    def foo():
+        time.sleep(TEST_INTERVAL)
+        return 3
+
+    future = foo()
+    future.add_done_callback(lambda f: results.append(f.receive()))
+    assert future.receive() == 3
+
+    # The callback may be invoked just after the result is set.
+    time.sleep(TEST_INTERVAL)
+    assert results == [3]
+
+    future.add_done_callback(lambda f: results.append(f.receive()))
+    assert results == [3, 3]
+
+
+class TestCached(object):
+    """
+    Decorated callable runs in a reused worker if argument cached is True.
+    """
+
+    def teardown_method(self, method):
+        # Don't leave the workers for the other tests.
+        async_module = sys.modules['thread_utils.async']
+        with async_module._cached_pools_lock:
+            for p in async_module._cached_pools.values():
+                p.kill(block=True)
+            async_module._cached_pools.clear()
+
+    def test_receive_what_invoked_callable_returned_or_raised(self):
+        @thread_utils.async(cached=True)
+        def foo(r, e=None):
+            if e is not None:
+                raise e
+            return r
+
+        for r in SAMPLE_RESULTS:
+            assert foo(r).receive() is r
+
+        for e in SAMPLE_EXCEPTIONS:
+            with pytest.raises(type(e)):
+                foo(None, e).receive()
+
+    def test_worker_is_reused(self):
+        @thread_utils.async(cached=True)
+        def foo():
+            return threading.current_thread()
+
+        workers = set()
+        for i in range(TEST_COUNT * 10):
+            workers.add(foo().receive())
+
+        # A new worker can be created while the previous one is returning
+        # from the last task, but most of them are reused.
+        assert len(workers) < TEST_COUNT
+
+    def test_workers_run_concurrently(self):
+        @thread_utils.async(cached=True)
+        def foo():
+            time.sleep(TEST_INTERVAL)
+
+        start = time.time()
+        futures = [foo() for i in range(TEST_COUNT)]
+        for f in futures:
+            f.receive()
+
+        assert time.time() - start < TEST_INTERVAL * TEST_COUNT
+
+    def test_worker_is_daemonic_unless_specified(self):
+        def foo():
+            return threading.current_thread().daemon
+
+        assert thread_utils.async(cached=True)(foo)().receive()
+        assert not thread_utils.async(daemon=False, cached=True)(foo)() \
+            .receive()
+
+
+    def test_idle_worker_starts_call_promptly(self):
+        """
+        A call is started at once even if the workers have been idle.
+        """
+
+        @thread_utils.async(cached=True)
+        def foo():
+            return time.time()
+
+        foo().receive()
+
+        delays = []
+        for i in range(TEST_COUNT):
+            time.sleep(TEST_INTERVAL / 2)
+            called_at = time.time()
+            delays.append(foo().receive() - called_at)
+
+        delays.sort()
+        assert delays[TEST_COUNT // 2] < TEST_INTERVAL / 20
+
+
+class TestMaxConcurrent(object):
+    """
+    At most max_concurrent calls run at the same time.
+    """
+
+    def test_calls_are_queued(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        @thread_utils.async(max_concurrent=2)
+        def foo(n):
+            with lock:
+                running.append(n)
+                peak.append(len(running))
+            time.sleep(TEST_INTERVAL)
+            with lock:
+                running.remove(n)
+            return n
+
+        initial_count = threading.active_count()
+        futures = [foo(i) for i in range(TEST_COUNT)]
+        time.sleep(TEST_INTERVAL / 2)
+        assert threading.active_count() <= initial_count + 2
+
+        # Queued calls are not finished.
+        assert not futures[-1].is_finished()
+        with pytest.raises(thread_utils.TimeoutError):
+            futures[-1].receive(TEST_INTERVAL / 10)
+
+        assert [f.receive() for f in futures] == list(range(TEST_COUNT))
+        assert max(peak) == 2
+
+    def test_callables_have_own_limit(self):
+        def foo():
+            time.sleep(TEST_INTERVAL)
+
+        foo1 = thread_utils.async(max_concurrent=1)(foo)
+        foo2 = thread_utils.async(max_concurrent=1)(foo)
+
+        start = time.time()
+        [f.receive() for f in [foo1(), foo2()]]
+        assert time.time() - start < TEST_INTERVAL * 2
+
+    def test_idle_worker_starts_call_promptly(self):
+        """
+        A call is started at once even if the workers have been idle.
+        """
+
+        @thread_utils.async(max_concurrent=4)
+        def foo():
+            return time.time()
+
+        foo().receive()
+
+        delays = []
+        for i in range(TEST_COUNT):
+            time.sleep(TEST_INTERVAL / 2)
+            called_at = time.time()
+            delays.append(foo().receive() - called_at)
+
+        delays.sort()
+        assert delays[TEST_COUNT // 2] < TEST_INTERVAL / 20
+
+    def test_queue_policy(self):
+        @thread_utils.async(max_concurrent=1, max_queue_size=1,
+                            queue_policy='reject')
+        def foo():
+            time.sleep(TEST_INTERVAL)
+
+        foo()
+        time.sleep(TEST_INTERVAL / 2)
+        foo()
+        with pytest.raises(thread_utils.QueueFullError):
+            foo()
+
+    def test_argument_check(self):
+        with pytest.raises(ValueError):
+            thread_utils.async(max_concurrent=0)
+        with pytest.raises(TypeError):
+            thread_utils.async(max_concurrent=1.0)
+        with pytest.raises(ValueError):
+            thread_utils.async(cached=True, max_concurrent=1)
+        with pytest.raises(ValueError):
+            thread_utils.async(max_queue_size=1)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import subprocess
+import threading
+import thread_utils
+import time
+from thread_utils import _gc
+
+
+TEST_INTERVAL = 0.1
+TEST_COUNT = 5
+
+
+def test_import_does_not_start_thread():
+    """
+    Importing thread_utils doesn't start any thread.
+    """
+
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import threading; count = threading.active_count(); "
+            "import thread_utils; "
+            "assert threading.active_count() == count")
+
+    assert subprocess.call([sys.executable, '-c', code], cwd=src_dir) == 0
+
+
+def test_terminated_threads_are_joined():
+    """
+    The threads put to _gc are joined in batches after terminated.
+    """
+
+    def foo():
+        _gc._put(threading.current_thread())
+
+    reaped = _gc._reaped()
+    threads = [threading.Thread(target=foo) for i in range(TEST_COUNT)]
+    for t in threads:
+        t.start()
+
+    # Wait for the threads to be terminated without joining them.
+    while any(t.is_alive() for t in threads):
+        time.sleep(TEST_INTERVAL)
+
+    _gc._collect()
+    assert _gc._reaped() >= reaped + TEST_COUNT
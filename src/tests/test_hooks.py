@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import pytest
+import threading
+import thread_utils
+import time
+
+
+TEST_INTERVAL = 0.1
+SIZE = 10
+
+
+class Recorder(thread_utils.Hooks):
+    """
+    Hooks recording (event name, future or thread) pairs.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def on_submit(self, future):
+        self.events.append(('submit', future))
+
+    def on_start(self, future):
+        self.events.append(('start', future))
+
+    def on_finish(self, future):
+        assert future.is_finished()
+        self.events.append(('finish', future))
+
+    def on_cancel(self, future):
+        self.events.append(('cancel', future))
+
+    def on_worker_spawn(self):
+        self.events.append(('spawn', threading.current_thread()))
+
+    def on_worker_exit(self):
+        self.events.append(('exit', threading.current_thread()))
+
+    def names(self, target):
+        return [name for name, t in self.events if t is target]
+
+
+def test_pool_hooks_are_invoked_in_order():
+    recorder = Recorder()
+    p = thread_utils.Pool(worker_size=SIZE, hooks=recorder)
+    futures = [p.send(abs, -i) for i in range(SIZE)]
+    futures += p.send_many(abs, [(i,) for i in range(SIZE)])
+    p.kill(block=True)
+
+    for f in futures:
+        assert recorder.names(f) == ['submit', 'start', 'finish']
+
+    workers = set(t for name, t in recorder.events if name == 'spawn')
+    assert len(workers) == SIZE
+    for w in workers:
+        assert recorder.names(w) == ['spawn', 'exit']
+
+
+def test_pool_hooks_on_cancel():
+    recorder = Recorder()
+    p = thread_utils.Pool(worker_size=0, hooks=recorder)
+    future = p.send(abs, -1)
+    p.cancel()
+    p.kill()
+
+    assert recorder.names(future) == ['submit', 'cancel']
+
+
+def test_pool_hooks_on_future_cancel():
+    """
+    Task canceled by Future.cancel is notified of on_cancel and counted.
+    """
+
+    recorder = Recorder()
+    p = thread_utils.Pool(worker_size=0, hooks=recorder)
+    queued = p.send(abs, -1)
+    delayed = p.send_after(TEST_INTERVAL, abs, -1)
+    assert queued.cancel()
+    assert delayed.cancel()
+    assert not queued.cancel()
+
+    assert recorder.names(queued) == ['submit', 'cancel']
+    assert recorder.names(delayed) == ['cancel']
+    assert p.stats()['canceled'] == 2
+
+    p.set_worker_size(1)
+    p.kill(block=True)
+    stats = p.stats()
+    assert stats['completed'] == stats['failed'] == 0
+    assert recorder.names(queued) == ['submit', 'cancel']
+
+
+def test_task_is_claimed_before_on_start():
+    """
+    Task can't be canceled after on_start is invoked.
+    """
+
+    class Canceler(Recorder):
+        def on_start(self, future):
+            super(Canceler, self).on_start(future)
+            self.canceled = future.cancel()
+
+    recorder = Canceler()
+    p = thread_utils.Pool(hooks=recorder)
+    future = p.send(abs, -1)
+    assert future.receive() == 1
+    p.kill(block=True)
+
+    assert recorder.canceled is False
+    assert p.stats()['canceled'] == 0
+    assert recorder.names(future) == ['submit', 'start', 'finish']
+
+
+def test_pool_hooks_on_cancel_for_rejected_task():
+    """
+    Task not queued after on_submit is notified of on_cancel.
+    """
+
+    recorder = Recorder()
+    p = thread_utils.Pool(worker_size=0, max_queue_size=1,
+                          queue_policy='reject', hooks=recorder)
+    queued = p.send(abs, -1)
+    with pytest.raises(thread_utils.QueueFullError):
+        p.send(abs, -1)
+    p.kill()
+    with pytest.raises(thread_utils.DeadPoolError):
+        p.send_many(abs, [(-1,), (-2,)])
+
+    p = thread_utils.Pool(worker_size=0, hooks=recorder)
+    p.kill()
+    with pytest.raises(thread_utils.DeadPoolError):
+        p.send(abs, -1)
+
+    submitted = [f for name, f in recorder.events if name == 'submit']
+    assert len(submitted) == 5
+    assert recorder.names(queued) == ['submit']
+    for f in submitted[1:]:
+        assert recorder.names(f) == ['submit', 'cancel']
+
+
+def test_exception_in_hooks_is_ignored():
+    class Broken(thread_utils.Hooks):
+        def on_start(self, future):
+            raise RuntimeError
+
+        def on_finish(self, future):
+            raise RuntimeError
+
+    with thread_utils.Pool(hooks=Broken()) as p:
+        assert p.send(abs, -1).receive() == 1
+        assert p.send(abs, -2).receive() == 2
+
+
+def test_TypeError_if_hooks_is_not_Hooks():
+    with pytest.raises(TypeError):
+        thread_utils.Pool(hooks=object())
+
+    with pytest.raises(TypeError):
+        thread_utils.async(hooks=object())
+
+
+def test_async_hooks_are_invoked_in_order():
+    recorder = Recorder()
+
+    @thread_utils.async(hooks=recorder)
+    def foo():
+        return threading.current_thread()
+
+    future = foo()
+    worker = future.receive()
+    worker.join()
+
+    assert recorder.names(future) == ['submit', 'start', 'finish']
+    assert recorder.names(worker) == ['spawn', 'exit']
+
+
+def test_trace_recorder_writes_chrome_trace_events(tmpdir):
+    recorder = thread_utils.TraceRecorder()
+    with thread_utils.Pool(worker_size=2, hooks=recorder) as p:
+        futures = [p.send(time.sleep, TEST_INTERVAL / SIZE)
+                   for i in range(SIZE)]
+        for f in futures:
+            f.receive()
+
+    # Wait for the workers to exit.
+    time.sleep(TEST_INTERVAL)
+
+    path = str(tmpdir.join('trace.json'))
+    recorder.save(path)
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+
+    slices = [e for e in events if e['ph'] == 'X']
+    assert len(slices) == SIZE
+    for e in slices:
+        assert e['name'] == 'task'
+        assert e['dur'] >= TEST_INTERVAL / SIZE * 1000000 * 0.9
+
+    begins = set(e['id'] for e in events if e['ph'] == 'b')
+    ends = set(e['id'] for e in events if e['ph'] == 'e')
+    assert begins == ends == set(e['args']['id'] for e in slices)
+
+    assert len([e for e in events if e['name'] == 'worker spawn']) == 2
+    assert len([e for e in events if e['name'] == 'worker exit']) == 2
+
+
+def test_trace_recorder_closes_slice_of_canceled_task():
+    recorder = thread_utils.TraceRecorder()
+    p = thread_utils.Pool(worker_size=0, hooks=recorder)
+    p.send(abs, -1).cancel()
+    p.kill()
+
+    events = recorder.events()
+    assert [e['ph'] for e in events if e['name'] == 'queued'] == ['b', 'e']
+    assert len([e for e in events if e['name'] == 'cancel']) == 1
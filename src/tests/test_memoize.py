@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import threading
+import thread_utils
+import time
+
+
+TEST_INTERVAL = 0.1
+SIZE = 10
+
+
+def test_cache():
+    calls = []
+
+    @thread_utils.memoize(maxsize=2)
+    def foo(n, m=0):
+        calls.append((n, m))
+        return n + m
+
+    assert foo(1) == 1
+    assert foo(1) == 1
+    assert foo(1, m=1) == 2
+    assert calls == [(1, 0), (1, 1)]
+
+    # foo(2) evicts foo(1, m=1), which is the least recently used.
+    assert foo(1) == 1
+    assert foo(2) == 2
+    assert foo(1) == 1
+    assert foo(1, m=1) == 2
+    assert calls == [(1, 0), (1, 1), (2, 0), (1, 1)]
+
+    assert foo.cache_info() == {'hits': 3, 'misses': 4, 'evictions': 2,
+                                'currsize': 2, 'maxsize': 2}
+
+    foo.cache_clear()
+    assert foo.cache_info() == {'hits': 0, 'misses': 0, 'evictions': 0,
+                                'currsize': 0, 'maxsize': 2}
+    foo(1)
+    assert len(calls) == 5
+
+
+def test_ttl():
+    calls = []
+
+    @thread_utils.memoize(ttl=TEST_INTERVAL, key=lambda n: n % 2)
+    def foo(n):
+        calls.append(n)
+        return n
+
+    assert foo(1) == 1
+    assert foo(3) == 1
+    time.sleep(TEST_INTERVAL * 2)
+    assert foo(3) == 3
+    assert calls == [1, 3]
+    assert foo.cache_info()['evictions'] == 1
+
+
+def test_single_flight():
+    calls = []
+    results = []
+
+    @thread_utils.memoize
+    def foo(n):
+        calls.append(n)
+        time.sleep(TEST_INTERVAL)
+        return n
+
+    def call():
+        results.append(foo(1))
+
+    threads = [threading.Thread(target=call) for i in xrange(SIZE)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+
+    assert calls == [1]
+    assert results == [1] * SIZE
+
+
+def test_error_is_not_cached():
+    calls = []
+
+    @thread_utils.memoize
+    def foo():
+        calls.append(None)
+        raise ValueError
+
+    for i in xrange(2):
+        with pytest.raises(ValueError):
+            foo()
+
+    assert len(calls) == 2
+    assert foo.cache_info()['currsize'] == 0
+
+
+def test_pool():
+    calls = []
+
+    with thread_utils.Pool(worker_size=2) as pool:
+        @thread_utils.memoize(pool=pool)
+        def foo(n):
+            calls.append(threading.current_thread())
+            time.sleep(TEST_INTERVAL)
+            return n
+
+        futures = [foo(1) for i in xrange(SIZE)]
+        assert all(f is futures[0] for f in futures)
+        assert futures[0].receive() == 1
+        assert calls[0] is not threading.current_thread()
+        assert len(calls) == 1
+
+        # Canceled tasks are not cached.
+        pool.send(time.sleep, TEST_INTERVAL)
+        pool.send(time.sleep, TEST_INTERVAL)
+        f = foo(2)
+        pool.cancel()
+        with pytest.raises(thread_utils.CancelError):
+            f.receive()
+        assert foo(2).receive() == 2
+
+
+def test_argument_check():
+    with pytest.raises(ValueError):
+        thread_utils.memoize(maxsize=0)
+    with pytest.raises(TypeError):
+        thread_utils.memoize(maxsize=1.0)
+    with pytest.raises(ValueError):
+        thread_utils.memoize(ttl=0)
+    with pytest.raises(TypeError):
+        thread_utils.memoize(pool=1)
+    with pytest.raises(TypeError):
+        thread_utils.memoize(key=1)
@@ -16,6 +16,7 @@ limitations under the License.
 '''
 
 
+import gc
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -24,6 +25,7 @@ import pytest
 import threading
 import thread_utils
 import time
+import weakref
 
 
 TEST_INTERVAL = 0.1
@@ -443,6 +445,1022 @@ class TestReceiveExceptionTaskRaised(object):
             futures[-1].receive()
 
 
+class TestWorkStealing(object):
+    """
+    In work stealing mode, tasks sent from a worker are queued to its own
+    queue and the other workers steal them.
+    """
+
+    def test_sub_tasks_are_done_in_LIFO_order(self):
+        """
+        A worker does the newest task in its own queue first.
+        """
+
+        order = []
+
+        def parent():
+            return [p.send(order.append, i) for i in range(SIZE)]
+
+        p = thread_utils.Pool(worker_size=1, work_stealing=True)
+        futures = p.send(parent).receive()
+        [f.receive() for f in futures]
+        p.kill(block=True)
+
+        assert order == list(reversed(range(SIZE)))
+
+    def test_idle_workers_steal_tasks(self):
+        """
+        Workers with nothing to do steal tasks of the other worker.
+        """
+
+        def parent():
+            return [p.send(time.sleep, TEST_INTERVAL) for i in range(SIZE)]
+
+        p = thread_utils.Pool(worker_size=SIZE, work_stealing=True)
+
+        start = time.time()
+        futures = p.send(parent).receive()
+        [f.receive() for f in futures]
+        assert time.time() - start < TEST_INTERVAL * 3
+        p.kill(block=True)
+
+    def test_cancel_and_inspect_local_tasks(self):
+        """
+        Pool.inspect counts tasks in local queues and Pool.cancel cancels them.
+        """
+
+        event = threading.Event()
+
+        def parent():
+            futures = [p.send(lambda: None) for i in range(SIZE)]
+            event.wait()
+            return futures
+
+        p = thread_utils.Pool(worker_size=1, work_stealing=True)
+        f = p.send(parent)
+        time.sleep(TEST_INTERVAL)
+        assert p.inspect() == (1, 1, SIZE)
+
+        p.cancel()
+        assert p.inspect() == (1, 1, 0)
+        event.set()
+
+        for sub in f.receive():
+            with pytest.raises(thread_utils.CancelError):
+                sub.receive()
+        p.kill(block=True)
+
+    def test_local_tasks_are_handed_over_when_worker_is_recreated(self):
+        """
+        Tasks left in a local queue are done after the worker is recreated.
+        """
+
+        def parent():
+            return [p.send(lambda x: x, i) for i in range(SIZE)]
+
+        p = thread_utils.Pool(worker_size=1, loop_count=1, work_stealing=True)
+        futures = p.send(parent).receive()
+        p.kill()
+        assert [f.receive(timeout=TEST_INTERVAL * 10) for f in futures] == \
+            list(range(SIZE))
+
+
+class TestSendMany(object):
+    """
+    Pool.send_many and Pool.send_batch queue many tasks at once.
+    """
+
+    def setup_method(self, method):
+        self.p = thread_utils.Pool(worker_size=SIZE)
+
+    def teardown_method(self, method):
+        self.p.kill()
+
+    def test_send_many(self):
+        """
+        Pool.send_many invokes the callable with each argument tuple.
+        """
+
+        futures = self.p.send_many(pow, [(2, i) for i in range(SIZE)])
+        assert [f.receive() for f in futures] == \
+            [2 ** i for i in range(SIZE)]
+
+    def test_send_batch(self):
+        """
+        Pool.send_batch invokes various callables with the arguments.
+        """
+
+        def foo(a, b=0):
+            return a - b
+
+        futures = self.p.send_batch([(abs, (-1,)), (foo, (3,), {'b': 1})])
+        assert [f.receive() for f in futures] == [1, 2]
+
+        with pytest.raises(TypeError):
+            self.p.send_batch([(None, ())])
+
+    def test_tasks_are_queued_at_once(self):
+        """
+        All tasks are queued and wake up workers.
+        """
+
+        p = thread_utils.Pool(worker_size=0)
+        p.send_many(time.sleep, [(TEST_INTERVAL,)] * SIZE)
+        assert p.inspect() == (0, 0, SIZE)
+
+        p.set_worker_size(SIZE)
+        time.sleep(TEST_INTERVAL / 2)
+        assert p.inspect() == (SIZE, SIZE, 0)
+        p.kill(block=True)
+
+        with pytest.raises(thread_utils.DeadPoolError):
+            p.send_many(time.sleep, [(0,)])
+
+
+class TestPriority(object):
+    """
+    Tasks with smaller priority are done earlier.
+    """
+
+    def test_tasks_are_done_in_order_of_priority(self):
+        """
+        Tasks are done in order of priority, and FIFO in the same priority.
+        """
+
+        order = []
+        p = thread_utils.Pool(worker_size=0)
+
+        p.send(order.append, 'a')
+        p.send_with_priority(1, order.append, 'b')
+        p.send_with_priority(-1, order.append, 'c')
+        p.send_with_priority(1, order.append, 'd')
+        p.send_many(order.append, [('e',), ('f',)], priority=-1)
+        p.send_batch([(order.append, ('g',))], priority=0.5)
+        assert p.inspect() == (0, 0, 7)
+
+        p.set_worker_size(1)
+        p.kill(block=True)
+        assert order == ['c', 'e', 'f', 'a', 'g', 'b', 'd']
+
+    def test_priority_is_number(self):
+        """
+        TypeError is raised if priority is not a number.
+        """
+
+        p = thread_utils.Pool(worker_size=0)
+        with pytest.raises(TypeError):
+            p.send_with_priority('1', abs, 1)
+        with pytest.raises(TypeError):
+            p.send_many(abs, [(1,)], priority=None)
+        p.kill()
+
+    def test_stop_signals_with_priority(self):
+        """
+        Pool.kill stops workers after all tasks even with priority, and
+        Pool.set_worker_size stops workers before queued tasks.
+        """
+
+        p = thread_utils.Pool(worker_size=2)
+        p.send(time.sleep, TEST_INTERVAL)
+        p.send(time.sleep, TEST_INTERVAL)
+        futures = [p.send_with_priority(i, lambda: None) for i in range(SIZE)]
+
+        time.sleep(TEST_INTERVAL / 2)
+        p.set_worker_size(1)
+        time.sleep(TEST_INTERVAL)
+        assert p.inspect() == (1, 0, 0)
+
+        futures += [p.send_with_priority(SIZE, lambda: None)]
+        p.kill(block=True)
+        assert all(f.is_finished() for f in futures)
+
+    def test_cancel_with_priority(self):
+        """
+        Pool.cancel cancels tasks of every priority.
+        """
+
+        p = thread_utils.Pool(worker_size=0)
+        futures = [p.send_with_priority(i, lambda: None) for i in range(SIZE)]
+        p.cancel()
+        assert p.inspect() == (0, 0, 0)
+
+        for f in futures:
+            with pytest.raises(thread_utils.CancelError):
+                f.receive()
+
+
+class TestBoundedQueue(object):
+    """
+    The queue size can be limited and queue_policy decides what to do when a
+    task is sent to the full queue.
+    """
+
+    def test_reject(self):
+        """
+        QueueFullError is raised when the queue is full in 'reject' policy.
+        """
+
+        p = thread_utils.Pool(worker_size=0, max_queue_size=2,
+                              queue_policy='reject')
+        p.send(lambda: None)
+        p.send(lambda: None)
+
+        with pytest.raises(thread_utils.QueueFullError):
+            p.send(lambda: None)
+        with pytest.raises(thread_utils.QueueFullError):
+            p.send_many(abs, [(1,)])
+
+        assert p.inspect() == (0, 0, 2)
+        assert p.inspect().rejected_tasks == 2
+        p.kill(force=True)
+
+    def test_block(self):
+        """
+        Sender blocks until the queue has a room in 'block' policy.
+        """
+
+        p = thread_utils.Pool(worker_size=1, max_queue_size=1)
+        p.send(time.sleep, TEST_INTERVAL)
+        p.send(time.sleep, TEST_INTERVAL)
+
+        start = time.time()
+        p.send(lambda: None)
+        assert time.time() - start > TEST_INTERVAL / 2
+        assert p.inspect().rejected_tasks == 0
+
+        # Batch larger than the queue is queued little by little.
+        futures = p.send_many(abs, [(-i,) for i in range(SIZE)])
+        assert [f.receive() for f in futures] == list(range(SIZE))
+        p.kill()
+
+    def test_block_wakeup_is_not_lost(self, monkeypatch):
+        """
+        Blocked sender is woken up even if the queue is emptied while it
+        checks the room.
+        """
+
+        sender = threading.current_thread()
+        delayed = []
+
+        class SlowTime(object):
+            # Delay the sender just after it checks the room.
+            def __getattr__(self, name):
+                return getattr(time, name)
+
+            def time(self):
+                if threading.current_thread() is sender and not delayed:
+                    delayed.append(None)
+                    time.sleep(TEST_INTERVAL * 2)
+                return time.time()
+
+        p = thread_utils.Pool(worker_size=1, max_queue_size=1,
+                              block_timeout=TEST_INTERVAL * 10)
+        p.send(time.sleep, TEST_INTERVAL)
+        p.send(lambda: None)
+
+        monkeypatch.setattr(sys.modules['thread_utils.pool'], 'time',
+                            SlowTime())
+        start = time.time()
+        p.send(lambda: None).receive()
+        assert delayed
+        assert time.time() - start < TEST_INTERVAL * 5
+        p.kill()
+
+    def test_block_timeout(self):
+        """
+        QueueFullError is raised after timeout in 'block' policy.
+        """
+
+        p = thread_utils.Pool(worker_size=0, max_queue_size=1,
+                              block_timeout=TEST_INTERVAL)
+        p.send(lambda: None)
+
+        start = time.time()
+        with pytest.raises(thread_utils.QueueFullError):
+            p.send(lambda: None)
+        assert time.time() - start >= TEST_INTERVAL
+        assert p.inspect().rejected_tasks == 1
+
+        # Blocked sender is woken up when the pool is killed.
+        p = thread_utils.Pool(worker_size=0, max_queue_size=1)
+        p.send(lambda: None)
+        threading.Timer(TEST_INTERVAL, p.kill).start()
+        with pytest.raises(thread_utils.DeadPoolError):
+            p.send(lambda: None)
+
+    def test_partially_queued_batch(self):
+        """
+        The error tells which tasks of the batch are queued.
+        """
+
+        p = thread_utils.Pool(worker_size=1, max_queue_size=2,
+                              block_timeout=TEST_INTERVAL)
+        p.send(time.sleep, TEST_INTERVAL / 2)
+        time.sleep(TEST_INTERVAL / 10)
+
+        # 2 tasks are queued at once, and 1 more after the first task.
+        with pytest.raises(thread_utils.QueueFullError) as e:
+            p.send_many(time.sleep, [(TEST_INTERVAL,)] * SIZE)
+        assert len(e.value.queued) == 3
+        p.kill(block=True)
+        assert all(f.receive() is None for f in e.value.queued)
+
+        p = thread_utils.Pool(worker_size=0)
+        p.kill()
+        with pytest.raises(thread_utils.DeadPoolError) as e:
+            p.send_batch([(abs, (1,))])
+        assert e.value.queued == ()
+
+    def test_caller_runs(self):
+        """
+        The task is done in the sender thread in 'caller_runs' policy.
+        """
+
+        p = thread_utils.Pool(worker_size=0, max_queue_size=1,
+                              queue_policy='caller_runs')
+        current = threading.current_thread
+        f1 = p.send(current)
+        f2 = p.send(current)
+
+        assert not f1.is_finished()
+        assert f2.receive(timeout=0) is threading.current_thread()
+        assert p.inspect() == (0, 0, 1)
+        assert p.inspect().rejected_tasks == 1
+        p.kill(force=True)
+
+    def test_drop_oldest(self):
+        """
+        The oldest task is canceled in 'drop_oldest' policy.
+        """
+
+        p = thread_utils.Pool(worker_size=0, max_queue_size=2,
+                              queue_policy='drop_oldest')
+        futures = [p.send(abs, -i) for i in range(3)]
+
+        with pytest.raises(thread_utils.CancelError):
+            futures[0].receive()
+        assert p.inspect() == (0, 0, 2)
+        assert p.inspect().rejected_tasks == 1
+
+        p.set_worker_size(1)
+        assert [f.receive() for f in futures[1:]] == [1, 2]
+        p.kill()
+
+    def test_arguments(self):
+        """
+        Arguments are checked.
+        """
+
+        with pytest.raises(ValueError):
+            thread_utils.Pool(max_queue_size=-1)
+        with pytest.raises(ValueError):
+            thread_utils.Pool(queue_policy='foo')
+
+
+class TestElastic(object):
+    """
+    Elastic pool creates workers on demand and idle workers kill themselves.
+    """
+
+    def test_workers_are_created_on_demand(self):
+        """
+        Workers are created only when tasks come and no worker is idle.
+        """
+
+        time.sleep(TEST_INTERVAL)
+        initial_count = threading.active_count()
+
+        p = thread_utils.Pool(max_workers=3, idle_timeout=TEST_INTERVAL)
+        assert p.inspect() == (0, 0, 0)
+        assert threading.active_count() == initial_count
+
+        futures = [p.send(time.sleep, TEST_INTERVAL) for i in range(SIZE)]
+        time.sleep(TEST_INTERVAL / 2)
+        assert p.inspect() == (3, 3, SIZE - 3)
+
+        [f.receive() for f in futures]
+        p.send(lambda: None).receive()
+        assert p.inspect()[0] <= 3
+
+        # Idle workers kill themselves.
+        time.sleep(TEST_INTERVAL * 3)
+        assert p.inspect() == (0, 0, 0)
+        assert threading.active_count() == initial_count
+
+        p.kill(block=True)
+
+    def test_idle_worker_starts_task_promptly(self):
+        """
+        Idle workers don't poll for the idle timeout; a task sent to an idle
+        worker is started at once.
+        """
+
+        with thread_utils.Pool(max_workers=2, idle_timeout=60) as p:
+            p.send(lambda: None).receive()
+
+            delays = []
+            for i in range(SIZE):
+                time.sleep(TEST_INTERVAL / 2)
+                sent_at = time.time()
+                delays.append(p.send(time.time).receive() - sent_at)
+
+        delays.sort()
+        assert delays[SIZE // 2] < TEST_INTERVAL / 20
+
+    def test_map_uses_max_workers(self):
+        """
+        The default window of map is based on max_workers.
+        """
+
+        with thread_utils.Pool(max_workers=SIZE) as p:
+            start = time.time()
+            p.map(time.sleep, [TEST_INTERVAL] * SIZE)
+            assert time.time() - start < TEST_INTERVAL * 3
+
+    def test_min_workers(self):
+        """
+        Workers do not kill themselves less than min_workers.
+        """
+
+        p = thread_utils.Pool(min_workers=1, max_workers=SIZE,
+                              idle_timeout=TEST_INTERVAL)
+        assert p.inspect() == (1, 0, 0)
+
+        futures = p.send_many(time.sleep, [(TEST_INTERVAL,)] * SIZE)
+        time.sleep(TEST_INTERVAL / 2)
+        assert p.inspect() == (SIZE, SIZE, 0)
+
+        [f.receive() for f in futures]
+        time.sleep(TEST_INTERVAL * 3)
+        assert p.inspect() == (1, 0, 0)
+
+        p.kill(block=True)
+        assert p.inspect() == (0, 0, 0)
+
+    def test_workers_live_without_idle_timeout(self):
+        """
+        Workers never kill themselves if idle_timeout is None.
+        """
+
+        p = thread_utils.Pool(max_workers=2)
+        futures = [p.send(time.sleep, TEST_INTERVAL) for i in range(2)]
+        [f.receive() for f in futures]
+        time.sleep(TEST_INTERVAL)
+        assert p.inspect() == (2, 0, 0)
+        p.kill(block=True)
+
+    def test_arguments(self):
+        """
+        Arguments are checked.
+        """
+
+        with pytest.raises(ValueError):
+            thread_utils.Pool(idle_timeout=1)
+        with pytest.raises(ValueError):
+            thread_utils.Pool(min_workers=2, max_workers=1)
+        with pytest.raises(ValueError):
+            thread_utils.Pool(max_workers=0)
+        with pytest.raises(ValueError):
+            thread_utils.Pool(max_workers=1, idle_timeout=0)
+
+
+class TestRateLimit(object):
+    """
+    Rate limited pool starts tasks at the specified rate.
+    """
+
+    def test_tasks_are_started_at_the_rate(self):
+        rate = 1 / TEST_INTERVAL
+        with thread_utils.Pool(worker_size=SIZE, rate_limit=rate,
+                               burst=2) as p:
+            futures = [p.send(time.time) for i in range(6)]
+            start = time.time()
+            started = sorted(f.receive() for f in futures)
+
+        # 2 tasks start at once, and the others every TEST_INTERVAL.
+        assert started[1] - start < TEST_INTERVAL / 2
+        for i in range(2, 6):
+            assert (i - 1.5) * TEST_INTERVAL < started[i] - start < \
+                (i - 0.5) * TEST_INTERVAL + 0.05
+
+    def test_workers_are_not_occupied(self):
+        """
+        Workers waiting for the rate limit don't block each other's tasks.
+        """
+
+        with thread_utils.Pool(worker_size=2, rate_limit=1 / TEST_INTERVAL,
+                               burst=1) as p:
+            # The long task doesn't delay the next task more than the rate.
+            p.send(time.sleep, TEST_INTERVAL * 5)
+            start = time.time()
+            assert p.send(time.time).receive() - start < TEST_INTERVAL * 2
+
+    def test_kill_with_force_does_not_wait(self):
+        p = thread_utils.Pool(worker_size=1, rate_limit=0.01)
+        futures = [p.send(time.sleep, 0) for i in range(3)]
+
+        start = time.time()
+        p.kill(force=True, block=True)
+        assert time.time() - start < 1
+        with pytest.raises(thread_utils.CancelError):
+            futures[-1].receive()
+
+    def test_argument_check(self):
+        with pytest.raises(ValueError):
+            thread_utils.Pool(rate_limit=0)
+        with pytest.raises(TypeError):
+            thread_utils.Pool(rate_limit='1')
+        with pytest.raises(ValueError):
+            thread_utils.Pool(rate_limit=1, burst=0)
+
+
+class TestDelayed(object):
+    """
+    send_after and send_at queue the task when it is due.
+    """
+
+    def test_task_is_queued_when_due(self):
+        with thread_utils.Pool(worker_size=1) as p:
+            start = time.time()
+            f1 = p.send_after(TEST_INTERVAL * 2, time.time)
+            f2 = p.send_at(start + TEST_INTERVAL, time.time)
+
+            # The worker is not occupied while waiting.
+            assert p.send(time.time).receive() - start < TEST_INTERVAL / 2
+            assert not f1.is_finished()
+
+            t2 = f2.receive()
+            t1 = f1.receive()
+            assert TEST_INTERVAL <= t2 - start < TEST_INTERVAL * 1.5
+            assert TEST_INTERVAL * 2 <= t1 - start < TEST_INTERVAL * 2.5
+
+    def test_many_timers(self):
+        with thread_utils.Pool(worker_size=2) as p:
+            futures = [p.send_after(TEST_INTERVAL * (i % 3) / 2, lambda: i)
+                       for i in range(SIZE * 100)]
+            [f.receive() for f in futures]
+
+    def test_cancel_future(self):
+        results = []
+        with thread_utils.Pool(worker_size=1) as p:
+            f = p.send_after(TEST_INTERVAL, results.append, 1)
+            assert f.cancel()
+            assert not f.cancel()
+            with pytest.raises(thread_utils.CancelError):
+                f.receive()
+
+            # Queued tasks can be canceled, too.
+            p.send(time.sleep, TEST_INTERVAL)
+            f = p.send(results.append, 2)
+            assert f.cancel()
+
+            f = p.send(results.append, 3)
+            f.receive()
+            assert not f.cancel()
+
+            time.sleep(TEST_INTERVAL * 2)
+        assert results == [3]
+
+    def test_earlier_task_is_not_delayed(self):
+        """
+        The timer waiting for a later task wakes up at once for an earlier
+        one.
+        """
+
+        with thread_utils.Pool(worker_size=1) as p:
+            later = p.send_after(60, lambda: None)
+            time.sleep(TEST_INTERVAL)
+
+            delays = []
+            for i in range(SIZE):
+                sent_at = time.time()
+                delays.append(p.send_after(0, time.time).receive() - sent_at)
+                time.sleep(TEST_INTERVAL / 2)
+            later.cancel()
+
+        delays.sort()
+        assert delays[SIZE // 2] < TEST_INTERVAL / 20
+
+    def test_cancel_and_kill_cancel_delayed_tasks(self):
+        p = thread_utils.Pool(worker_size=1)
+        f1 = p.send_after(TEST_INTERVAL, lambda: None)
+        p.cancel()
+        with pytest.raises(thread_utils.CancelError):
+            f1.receive(0)
+
+        f2 = p.send_after(TEST_INTERVAL, lambda: None)
+        p.kill(block=True)
+        with pytest.raises(thread_utils.CancelError):
+            f2.receive(0)
+        assert p.stats()['canceled'] == 2
+
+        with pytest.raises(thread_utils.DeadPoolError):
+            p.send_after(0, lambda: None)
+
+
+class TestDependent(object):
+    """
+    send_dependent queues the task when the dependencies are finished.
+    """
+
+    def test_results_are_passed(self):
+        with thread_utils.Pool(worker_size=2) as p:
+            a = p.send(lambda: 1)
+            b = p.send_after(TEST_INTERVAL, lambda: 2)
+            c = p.send_dependent([a, b], lambda x, y, z=0: (x, y, z), z=3)
+            d = p.send_dependent([c], lambda r, n: r + (n,), 4)
+            e = p.send_dependent([], lambda: 5)
+
+            assert d.receive() == (1, 2, 3, 4)
+            assert e.receive() == 5
+
+    def test_workers_are_not_blocked(self):
+        """
+        A wide graph is done by one worker without dead lock.
+        """
+
+        with thread_utils.Pool(worker_size=1) as p:
+            start = p.send_after(TEST_INTERVAL, lambda: 0)
+            middle = [p.send_dependent([start], lambda r, i: r + i, i)
+                      for i in range(SIZE)]
+            end = p.send_dependent(middle, lambda *r: sum(r))
+
+            # The worker is not occupied while waiting.
+            assert p.send(lambda: 1).receive() == 1
+            assert not end.is_finished()
+            assert end.receive() == sum(range(SIZE))
+
+    def test_failure_is_propagated(self):
+        calls = []
+
+        with thread_utils.Pool(worker_size=1) as p:
+            a = p.send(pow, 0, -1)
+            b = p.send_dependent([a], calls.append)
+            c = p.send_dependent([b], calls.append)
+            with pytest.raises(ZeroDivisionError):
+                c.receive()
+
+            d = p.send_after(TEST_INTERVAL, lambda: None)
+            e = p.send_dependent([d], calls.append)
+            assert d.cancel()
+            with pytest.raises(thread_utils.CancelError):
+                e.receive()
+
+        assert calls == []
+
+    def test_cancel(self):
+        p = thread_utils.Pool(worker_size=1)
+        a = p.send_after(TEST_INTERVAL, lambda: None)
+        b = p.send_dependent([a], lambda r: None)
+        p.cancel()
+        with pytest.raises(thread_utils.CancelError):
+            b.receive(0)
+
+        p.kill(block=True)
+        with pytest.raises(thread_utils.DeadPoolError):
+            p.send_dependent([], lambda: None)
+
+    def test_argument_check(self):
+        with thread_utils.Pool() as p:
+            with pytest.raises(TypeError):
+                p.send_dependent([None], lambda r: None)
+            with pytest.raises(TypeError):
+                p.send_dependent([], None)
+
+
+class TestMap(object):
+    """
+    Pool.map, Pool.imap and Pool.imap_unordered invoke a callable with each
+    element of an iterable in the workers.
+    """
+
+    def setup_method(self, method):
+        self.p = thread_utils.Pool(worker_size=SIZE)
+
+    def teardown_method(self, method):
+        self.p.kill()
+
+    def test_map_returns_results_in_order(self):
+        """
+        Pool.map and Pool.imap return results in order of the iterable.
+        """
+
+        assert self.p.map(abs, range(-SIZE * 10, 0)) == \
+            list(range(SIZE * 10, 0, -1))
+        assert list(self.p.imap(abs, iter(range(-SIZE, 0)), window=3)) == \
+            list(range(SIZE, 0, -1))
+
+    def test_imap_consumes_iterable_lazily(self):
+        """
+        Pool.imap sends at most `window' tasks at a time.
+        """
+
+        consumed = []
+
+        def generate():
+            for i in range(SIZE * 10):
+                consumed.append(i)
+                yield i
+
+        it = self.p.imap(lambda x: x, generate(), window=2)
+        assert next(it) == 0
+        assert len(consumed) <= 3
+
+        assert list(it) == list(range(1, SIZE * 10))
+
+    def test_imap_unordered_yields_in_order_of_completion(self):
+        """
+        Pool.imap_unordered yields results as soon as tasks are finished.
+        """
+
+        def foo(n):
+            time.sleep(n)
+            return n
+
+        args = [TEST_INTERVAL * 3, 0, 0]
+        assert list(self.p.imap_unordered(foo, args)) == [0, 0, args[0]]
+
+    def test_imap_raises_what_task_raised(self):
+        """
+        Pool.imap and Pool.imap_unordered raise what a task raised.
+        """
+
+        def foo(e):
+            raise e
+
+        for imap in (self.p.imap, self.p.imap_unordered):
+            with pytest.raises(RuntimeError):
+                list(imap(foo, [RuntimeError()]))
+
+    def test_imap_raises_DeadPoolError_after_killed(self):
+        """
+        Pool.imap and Pool.imap_unordered raise DeadPoolError at once if
+        called after killed.
+        """
+
+        self.p.kill()
+        for method in (self.p.imap, self.p.imap_unordered):
+            with pytest.raises(thread_utils.DeadPoolError):
+                method(abs, range(SIZE))
+        with pytest.raises(thread_utils.DeadPoolError):
+            self.p.map(abs, range(SIZE))
+
+    def test_imap_unordered_raises_CancelError_if_canceled(self):
+        """
+        Pool.imap_unordered does not block forever if the tasks are canceled.
+        """
+
+        p = thread_utils.Pool(worker_size=0)
+        it = p.imap_unordered(lambda x: x, range(SIZE))
+
+        threading.Timer(TEST_INTERVAL, p.cancel).start()
+        with pytest.raises(thread_utils.CancelError):
+            next(it)
+
+
+class TestDoneCallback(object):
+    """
+    Future.add_done_callback invokes a callable exactly once when the task is
+    finished.
+    """
+
+    def setup_method(self, method):
+        self.p = thread_utils.Pool(worker_size=SIZE)
+
+    def teardown_method(self, method):
+        self.p.kill()
+
+    def test_callback_is_invoked_in_worker_after_task_finished(self):
+        """
+        The callback is invoked by the worker after the result is set.
+        """
+
+        results = []
+        done = threading.Event()
+
+        def callback(future):
+            results.append((future.receive(), threading.current_thread()))
+            done.set()
+
+        def foo():
+            time.sleep(TEST_INTERVAL)
+            return threading.current_thread()
+
+        future = self.p.send(foo)
+        future.add_done_callback(callback)
+        assert done.wait(TEST_INTERVAL * 10)
+
+        assert len(results) == 1
+        assert results[0][0] is results[0][1]
+
+    def test_callback_is_invoked_at_once_if_task_has_been_finished(self):
+        """
+        The callback is invoked in the caller thread if the task has been
+        finished.
+        """
+
+        results = []
+        future = self.p.send(lambda: 3)
+        future.receive()
+
+        def callback(f):
+            results.append((f.receive(), threading.current_thread()))
+
+        future.add_done_callback(callback)
+        assert results == [(3, threading.current_thread())]
+
+    def test_callback_is_dispatched_to_pool(self):
+        """
+        The callback is invoked by the worker of argument `pool'.
+        """
+
+        other = thread_utils.Pool()
+        try:
+            results = []
+            done = threading.Event()
+
+            def callback(future):
+                results.append(threading.current_thread())
+                done.set()
+
+            future = self.p.send(time.sleep, TEST_INTERVAL)
+            future.add_done_callback(callback, pool=other)
+            assert done.wait(TEST_INTERVAL * 10)
+
+            assert len(results) == 1
+            assert results[0] is not threading.current_thread()
+            assert id(results[0]) in other._Pool__workers
+        finally:
+            other.kill(block=True)
+
+    def test_callback_is_invoked_once_when_canceled(self):
+        """
+        The callback is invoked exactly once even if the task is canceled.
+        """
+
+        p = thread_utils.Pool(worker_size=0)
+        results = []
+
+        future = p.send(lambda: 3)
+        future.add_done_callback(results.append)
+        future.add_done_callback(results.append)
+        p.cancel()
+        p.kill()
+
+        assert results == [future, future]
+        with pytest.raises(thread_utils.CancelError):
+            future.receive()
+
+    def test_exception_in_callback_is_ignored(self):
+        """
+        The exception raised by the callback does not break the worker.
+        """
+
+        def callback(future):
+            raise RuntimeError
+
+        future = self.p.send(time.sleep, TEST_INTERVAL)
+        future.add_done_callback(callback)
+        assert future.receive() is None
+        assert self.p.send(lambda: 3).receive() == 3
+
+    def test_TypeError_if_callback_is_not_callable(self):
+        future = self.p.send(lambda: 3)
+        with pytest.raises(TypeError):
+            future.add_done_callback(None)
+
+
+class TestFutureReleasesTask(object):
+    """
+    The future object doesn't keep the task after the task is finished.
+    """
+
+    class Payload(object):
+        pass
+
+    def test_arguments_are_released_after_task_finished(self):
+        p = thread_utils.Pool()
+        try:
+            payload = self.Payload()
+            ref = weakref.ref(payload)
+
+            future = p.send(lambda x: None, payload)
+            del payload
+            future.receive()
+
+            gc.collect()
+            assert ref() is None
+        finally:
+            p.kill()
+
+    def test_arguments_are_released_when_task_is_canceled(self):
+        p = thread_utils.Pool(worker_size=0)
+        payload = self.Payload()
+        ref = weakref.ref(payload)
+
+        future = p.send(lambda x: None, payload, key=payload)
+        del payload
+        p.cancel()
+
+        gc.collect()
+        assert ref() is None
+        with pytest.raises(thread_utils.CancelError):
+            future.receive()
+
+    def test_many_threads_can_wait_same_future(self):
+        p = thread_utils.Pool()
+        try:
+            future = p.send(time.sleep, TEST_INTERVAL)
+            results = []
+
+            def wait():
+                results.append(future.receive())
+
+            threads = [threading.Thread(target=wait) for _ in range(SIZE)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            assert results == [None] * SIZE
+        finally:
+            p.kill()
+
+
+class TestStats(object):
+    """
+    Pool.stats returns the cumulative statistics.
+    """
+
+    def test_counters(self):
+        # Only one worker to make the recycle count deterministic.
+        p = thread_utils.Pool(worker_size=1, loop_count=3)
+        try:
+            def foo(e):
+                if e is not None:
+                    raise e
+
+            futures = [p.send(foo, None) for i in range(SIZE)]
+            futures.append(p.send(foo, RuntimeError()))
+            for f in futures:
+                try:
+                    f.receive()
+                except RuntimeError:
+                    pass
+
+            # Wait for the workers to record the last tasks.
+            time.sleep(TEST_INTERVAL)
+            stats = p.stats()
+
+            assert stats['submitted'] == SIZE + 1
+            assert stats['completed'] == SIZE
+            assert stats['failed'] == 1
+            assert stats['canceled'] == 0
+            assert stats['recycled_workers'] == (SIZE + 1) // 3
+            assert stats['worker_size'] == 1
+            assert stats['queue_wait']['count'] == SIZE + 1
+            assert stats['run_time']['count'] == SIZE + 1
+            assert sum(c for _, c in stats['run_time']['buckets']) == \
+                SIZE + 1
+        finally:
+            p.kill(block=True)
+
+    def test_canceled_and_peak_queued_tasks(self):
+        p = thread_utils.Pool(worker_size=0)
+        p.send_many(abs, [(i,) for i in range(SIZE)])
+        p.cancel()
+
+        stats = p.stats()
+        assert stats['submitted'] == SIZE
+        assert stats['canceled'] == SIZE
+        assert stats['peak_queued_tasks'] == SIZE
+        assert stats['queued_tasks'] == 0
+        assert stats['queue_wait']['count'] == 0
+
+        p.kill()
+
+    def test_histograms_and_utilization(self):
+        p = thread_utils.Pool(worker_size=1)
+        try:
+            p.send(time.sleep, TEST_INTERVAL)
+            p.send(time.sleep, 0).receive()
+            time.sleep(TEST_INTERVAL / 10)
+            stats = p.stats()
+
+            # The 2nd task waited for the 1st one.
+            assert stats['queue_wait']['sum'] >= TEST_INTERVAL
+            assert stats['run_time']['sum'] >= TEST_INTERVAL
+            bound, count = stats['run_time']['buckets'][-1]
+            assert TEST_INTERVAL <= bound
+
+            worker, = stats['workers']
+            assert worker['completed'] == 2
+            assert worker['busy'] >= TEST_INTERVAL
+            assert 0 < worker['utilization'] <= 1
+        finally:
+            p.kill(block=True)
+
+
 def test_receive_raises_TimeoutError_if_task_do_not_finish_before_timeout():
     """
     future.receive() raises TimeoutError if task won't finish before timeout.
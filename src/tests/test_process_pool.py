@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import signal
+import time
+
+import thread_utils
+
+
+TEST_INTERVAL = 0.1
+SIZE = 4
+
+
+def raise_error(e):
+    raise e
+
+
+class TestProcessPool(object):
+    """
+    ProcessPool does tasks in child processes with the same interface to Pool.
+    """
+
+    def setup_method(self, method):
+        self.p = thread_utils.ProcessPool(worker_size=SIZE)
+
+    def teardown_method(self, method):
+        self.p.kill(block=True)
+
+    def test_tasks_are_done_in_child_processes(self):
+        """
+        Tasks are done in child processes and the results are received.
+        """
+
+        futures = [self.p.send(os.getpid) for i in range(SIZE * 2)]
+        pids = set(f.receive() for f in futures)
+        assert os.getpid() not in pids
+        assert 1 <= len(pids) <= SIZE
+
+        assert self.p.send(pow, 2, 10).receive() == 1024
+
+    def test_receive_raises_what_task_raised(self):
+        """
+        future.receive() raises Exception task raised in the child process.
+        """
+
+        with pytest.raises(RuntimeError):
+            self.p.send(raise_error, RuntimeError("Foo")).receive()
+
+        # Unpicklable task
+        with pytest.raises(Exception):
+            self.p.send(lambda: None).receive()
+
+    def test_tasks_are_done_parallel(self):
+        """
+        Worker processes do tasks at the same time.
+        """
+
+        start = time.time()
+        futures = [self.p.send(time.sleep, TEST_INTERVAL) for i in range(SIZE)]
+        [f.receive() for f in futures]
+        assert time.time() - start < TEST_INTERVAL * SIZE
+
+    def test_process_is_regenerated_after_loop_count(self):
+        """
+        Worker process is regenerated after it does loop_count tasks.
+        """
+
+        with thread_utils.ProcessPool(loop_count=2) as p:
+            pids = [p.send(os.getpid).receive() for i in range(4)]
+
+        assert pids[0] == pids[1]
+        assert pids[1] != pids[2]
+        assert pids[2] == pids[3]
+
+    def test_process_killed_while_idle_is_regenerated(self):
+        """
+        Worker process killed while idle is regenerated.
+        """
+
+        with thread_utils.ProcessPool() as p:
+            pid = p.send(os.getpid).receive()
+            os.kill(pid, signal.SIGKILL)
+            time.sleep(TEST_INTERVAL)
+
+            # The task sent to the killed process fails.
+            with pytest.raises(thread_utils.Error):
+                p.send(os.getpid).receive()
+
+            new_pid = p.send(os.getpid).receive()
+            assert new_pid != pid
+            assert p.send(pow, 2, 10).receive() == 1024
+
+    def test_cancel_and_inspect(self):
+        """
+        ProcessPool.cancel, inspect and set_worker_size work like Pool.
+        """
+
+        p = thread_utils.ProcessPool(worker_size=0)
+        futures = [p.send(os.getpid) for i in range(SIZE)]
+        assert p.inspect() == (0, 0, SIZE)
+
+        p.cancel()
+        for f in futures:
+            with pytest.raises(thread_utils.CancelError):
+                f.receive()
+
+        futures = [p.send(os.getpid) for i in range(SIZE)]
+        p.set_worker_size(1)
+        p.kill(block=True)
+        assert all(f.is_finished() for f in futures)
+
+        with pytest.raises(thread_utils.DeadPoolError):
+            p.send(os.getpid)
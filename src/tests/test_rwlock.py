@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import threading
+import time
+
+import thread_utils
+
+TEST_INTERVAL = 0.1
+TEST_COUNT = 5
+
+
+def elapsed(targets):
+    threads = [threading.Thread(target=t) for t in targets]
+
+    start = time.time()
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    return time.time() - start
+
+
+def sleep_holding(guard, n=TEST_INTERVAL):
+    def func():
+        with guard:
+            time.sleep(n)
+
+    return func
+
+
+def test_readers_run_at_the_same_time():
+    lock = thread_utils.RWLock()
+    assert elapsed([sleep_holding(lock.reader)] * TEST_COUNT) < \
+        TEST_INTERVAL * 2
+
+
+def test_writers_are_exclusive():
+    lock = thread_utils.RWLock()
+    assert elapsed([sleep_holding(lock.writer)] * TEST_COUNT) > \
+        TEST_INTERVAL * TEST_COUNT
+
+    assert elapsed([sleep_holding(lock.writer),
+                    sleep_holding(lock.reader)]) > TEST_INTERVAL * 2
+
+
+def start_in_order(targets):
+    threads = []
+    for t in targets:
+        threads.append(threading.Thread(target=t))
+        threads[-1].start()
+        time.sleep(TEST_INTERVAL / 10)
+    return threads
+
+
+def test_writer_preference():
+    """
+    A reader coming after a waiting writer waits for the writer.
+    """
+
+    lock = thread_utils.RWLock(writer_preference=True)
+    order = []
+
+    def reader():
+        with lock.reader:
+            order.append('r')
+            time.sleep(TEST_INTERVAL)
+
+    def writer():
+        with lock.writer:
+            order.append('w')
+
+    threads = start_in_order([reader, writer, reader])
+    [t.join() for t in threads]
+    assert order == ['r', 'w', 'r']
+
+
+def test_reader_preference():
+    """
+    A reader doesn't wait for a waiting writer.
+    """
+
+    lock = thread_utils.RWLock(writer_preference=False)
+    order = []
+
+    def reader():
+        with lock.reader:
+            order.append('r')
+            time.sleep(TEST_INTERVAL)
+
+    def writer():
+        with lock.writer:
+            order.append('w')
+
+    threads = start_in_order([reader, writer, reader])
+    [t.join() for t in threads]
+    assert order == ['r', 'r', 'w']
+
+
+def test_reentrant():
+    lock = thread_utils.RWLock(reentrant=True)
+
+    with lock.writer:
+        with lock.writer:
+            # Downgrade
+            with lock.reader:
+                pass
+
+    # Reading again while a writer is waiting doesn't deadlock.
+    done = []
+
+    def writer():
+        with lock.writer:
+            done.append(True)
+
+    with lock.reader:
+        t = threading.Thread(target=writer)
+        t.start()
+        time.sleep(TEST_INTERVAL)
+        with lock.reader:
+            assert not done
+
+        with pytest.raises(RuntimeError):
+            lock.acquire_write()
+
+    t.join()
+    assert done
+
+
+def test_errors():
+    lock = thread_utils.RWLock()
+
+    with pytest.raises(RuntimeError):
+        lock.release_read()
+    with pytest.raises(RuntimeError):
+        lock.release_write()
+
+    with lock.writer:
+        with pytest.raises(RuntimeError):
+            lock.acquire_write()
+
+
+def test_read_and_write_synchronized():
+    lock = thread_utils.RWLock()
+
+    @thread_utils.read_synchronized(lock)
+    def read(n):
+        time.sleep(n)
+
+    @thread_utils.write_synchronized(lock)
+    def write(n):
+        time.sleep(n)
+
+    readers = [lambda: read(TEST_INTERVAL)] * TEST_COUNT
+    assert elapsed(readers) < TEST_INTERVAL * 2
+    assert elapsed(readers + [lambda: write(TEST_INTERVAL)]) > \
+        TEST_INTERVAL * 2
+
+    with pytest.raises(TypeError):
+        thread_utils.read_synchronized(threading.Lock())
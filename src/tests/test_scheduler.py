@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import threading
+import thread_utils
+import time
+
+
+INTERVAL = 0.05
+
+
+class Recorder(object):
+    """
+    Callable recording when it is called and whether the calls overlap.
+    """
+
+    def __init__(self, duration=0):
+        self.duration = duration
+        self.times = []
+        self.running = 0
+        self.overlapped = False
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.running += 1
+            self.overlapped |= self.running > 1
+            self.times.append(time.time())
+        time.sleep(self.duration)
+        with self.lock:
+            self.running -= 1
+
+
+def test_fixed_rate():
+    with thread_utils.Pool(worker_size=2) as pool:
+        scheduler = thread_utils.Scheduler(pool)
+        recorder = Recorder()
+        job = scheduler.schedule(INTERVAL, recorder, delay=0)
+        time.sleep(INTERVAL * 5.5)
+        job.cancel()
+
+    # The last run is due INTERVAL / 2 before canceled.
+    assert len(recorder.times) in (5, 6)
+    # Runs don't drift.
+    for i, t in enumerate(recorder.times):
+        assert t - recorder.times[0] == pytest.approx(i * INTERVAL,
+                                                      abs=INTERVAL / 2)
+
+    stats = job.stats()
+    assert stats['runs'] == len(recorder.times)
+    assert stats['lateness']['count'] == len(recorder.times)
+    assert 0 <= stats['max_lateness'] < INTERVAL / 2
+
+
+def test_fixed_delay():
+    with thread_utils.Pool(worker_size=2) as pool:
+        scheduler = thread_utils.Scheduler(pool)
+        recorder = Recorder(INTERVAL)
+        job = scheduler.schedule(INTERVAL, recorder, mode='fixed_delay',
+                                 delay=0)
+        time.sleep(INTERVAL * 5.5)
+        job.cancel()
+
+    # Each run starts INTERVAL after the previous one finished.
+    assert len(recorder.times) == 3
+    for a, b in zip(recorder.times, recorder.times[1:]):
+        assert b - a >= INTERVAL * 2
+    assert not recorder.overlapped
+
+
+@pytest.mark.parametrize('overlap', ['skip', 'coalesce'])
+def test_overlap(overlap):
+    with thread_utils.Pool(worker_size=4) as pool:
+        scheduler = thread_utils.Scheduler(pool)
+        recorder = Recorder(INTERVAL * 2.5)
+        job = scheduler.schedule(INTERVAL, recorder, overlap=overlap,
+                                 delay=0)
+        time.sleep(INTERVAL * 6)
+        job.cancel()
+
+    assert not recorder.overlapped
+    stats = job.stats()
+    if overlap == 'skip':
+        # Runs at 0, 3, 6 and the others are skipped.
+        assert stats['skipped'] >= 3
+        assert stats['coalesced'] == 0
+        for a, b in zip(recorder.times, recorder.times[1:]):
+            assert b - a >= INTERVAL * 2.5
+    else:
+        # Runs back to back; a run due while running is coalesced.
+        assert stats['skipped'] == 0
+        assert stats['coalesced'] >= 1
+        for a, b in zip(recorder.times, recorder.times[1:]):
+            assert b - a == pytest.approx(INTERVAL * 2.5, abs=INTERVAL / 2)
+
+
+def test_cancel():
+    pool = thread_utils.Pool(worker_size=1)
+    scheduler = thread_utils.Scheduler(pool)
+    recorder = Recorder()
+
+    job1 = scheduler.schedule(INTERVAL, recorder)
+    job2 = scheduler.schedule(INTERVAL, recorder)
+    assert set(scheduler.jobs()) == set([job1, job2])
+
+    job1.cancel()
+    assert job1.is_canceled()
+    assert scheduler.jobs() == [job2]
+
+    # Killing the pool cancels the jobs.
+    pool.kill(block=True)
+    assert job2.is_canceled()
+    assert scheduler.jobs() == []
+    assert recorder.times == []
+
+    with pytest.raises(thread_utils.DeadPoolError):
+        scheduler.schedule(INTERVAL, recorder)
+
+
+def test_argument_check():
+    with thread_utils.Pool() as pool:
+        scheduler = thread_utils.Scheduler(pool)
+        with pytest.raises(ValueError):
+            scheduler.schedule(0, time.time)
+        with pytest.raises(TypeError):
+            scheduler.schedule(1, None)
+        with pytest.raises(ValueError):
+            scheduler.schedule(1, time.time, mode='foo')
+        with pytest.raises(ValueError):
+            scheduler.schedule(1, time.time, overlap='foo')
+
+    with pytest.raises(TypeError):
+        thread_utils.Scheduler(None)
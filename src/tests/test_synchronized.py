@@ -20,6 +20,8 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import gc
+import pytest
 import threading
 import time
 
@@ -115,3 +117,141 @@ def test_static_method_simultaneous_access():
     [t.start() for t in threads]
     [t.join() for t in threads]
     assert (time.time() - start) > TEST_INTERVAL * TEST_COUNT
+
+
+class TestScope(object):
+    """
+    Argument scope specifies which calls are exclusive each other.
+    """
+
+    class Foo(object):
+        @thread_utils.synchronized(scope='instance')
+        def bar(self, n):
+            time.sleep(n)
+
+        @thread_utils.synchronized(scope='instance')
+        def reenter(self):
+            # The lock is reentrant.
+            self.bar(0)
+            return True
+
+        @classmethod
+        @thread_utils.synchronized(scope='class')
+        def cls_bar(cls, n):
+            time.sleep(n)
+
+        @thread_utils.synchronized(scope='class')
+        def baz(self, n):
+            time.sleep(n)
+
+    class Sub(Foo):
+        pass
+
+    @staticmethod
+    def elapsed(targets):
+        threads = [threading.Thread(target=t, args=(TEST_INTERVAL,))
+                   for t in targets]
+
+        start = time.time()
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        return time.time() - start
+
+    def test_instance_scope(self):
+        foo = self.Foo()
+        assert self.elapsed([foo.bar] * TEST_COUNT) > \
+            TEST_INTERVAL * TEST_COUNT
+
+        # Objects don't block each other.
+        assert self.elapsed([self.Foo().bar for i in range(TEST_COUNT)]) < \
+            TEST_INTERVAL * 2
+
+        assert foo.reenter()
+
+    def test_class_scope(self):
+        # A classmethod and a method of the instance share the lock.
+        foo = self.Foo()
+        targets = [self.Foo.cls_bar, foo.baz] * TEST_COUNT
+        assert self.elapsed(targets) > TEST_INTERVAL * TEST_COUNT * 2
+
+        # Subclasses have their own lock.
+        assert self.elapsed([self.Foo().baz, self.Sub().baz]) < \
+            TEST_INTERVAL * 2
+
+    def test_instance_lock_is_released_with_instance(self):
+        size = len(_instance_locks())
+        foo = self.Foo()
+        foo.bar(0)
+        assert len(_instance_locks()) == size + 1
+
+        del foo
+        gc.collect()
+        assert len(_instance_locks()) == size
+
+    def test_errors(self):
+        with pytest.raises(ValueError):
+            thread_utils.synchronized(scope='foo')
+
+        class Slotted(object):
+            __slots__ = ()
+
+            @thread_utils.synchronized(scope='instance')
+            def bar(self):
+                pass
+
+        with pytest.raises(TypeError):
+            Slotted().bar()
+
+
+def _instance_locks():
+    return getattr(sys.modules['thread_utils.synchronized'],
+                   '__INSTANCE_LOCKS')
+
+
+class TestKey(object):
+    """
+    Calls with the same key are exclusive each other.
+    """
+
+    def test_calls_with_different_keys_run_in_parallel(self):
+        @thread_utils.synchronized(key=lambda k, n: k)
+        def foo(k, n):
+            time.sleep(n)
+
+        threads = [threading.Thread(target=foo, args=(i, TEST_INTERVAL))
+                   for i in range(TEST_COUNT)]
+        start = time.time()
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        assert (time.time() - start) < TEST_INTERVAL * 2
+
+        threads = [threading.Thread(target=foo, kwargs={'k': 'same',
+                                                        'n': TEST_INTERVAL})
+                   for i in range(TEST_COUNT)]
+        start = time.time()
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        assert (time.time() - start) > TEST_INTERVAL * TEST_COUNT
+
+    def test_lock_is_deleted_when_unused(self):
+        def key(k):
+            return k
+
+        @thread_utils.synchronized(key=key)
+        def foo(k):
+            return len(locks)
+
+        # The lock table is in the closure of the wrapper.
+        locks = [c.cell_contents for c in foo.__closure__
+                 if type(c.cell_contents).__name__ == '_KeyedLocks'][0]
+
+        assert foo(1) == 1
+        assert foo('a') == 1
+        assert len(locks) == 0
+
+    def test_errors(self):
+        with pytest.raises(TypeError):
+            thread_utils.synchronized(key=1)
+
+        with pytest.raises(ValueError):
+            thread_utils.synchronized(key=id, scope='instance')
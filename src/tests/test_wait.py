@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import thread_utils
+import time
+
+
+TEST_INTERVAL = 0.1
+SIZE = 10
+
+
+def sleep_and_return(n):
+    time.sleep(n)
+    return n
+
+
+def sleep_and_raise(n):
+    time.sleep(n)
+    raise RuntimeError(n)
+
+
+class TestWait(object):
+    """
+    thread_utils.wait blocks until the condition specified by return_when is
+    satisfied.
+    """
+
+    def setup_method(self, method):
+        self.p = thread_utils.Pool(worker_size=SIZE)
+
+    def teardown_method(self, method):
+        self.p.kill()
+
+    def test_all_completed(self):
+        futures = [self.p.send(sleep_and_return, TEST_INTERVAL)
+                   for _ in range(SIZE)]
+        futures.append(self.p.send(sleep_and_raise, 0))
+
+        done, not_done = thread_utils.wait(futures)
+        assert done == set(futures)
+        assert not_done == set()
+
+    def test_first_completed(self):
+        slow = self.p.send(sleep_and_return, TEST_INTERVAL * 10)
+        fast = self.p.send(sleep_and_return, 0)
+
+        done, not_done = thread_utils.wait(
+            [slow, fast], return_when=thread_utils.FIRST_COMPLETED)
+        assert done == set([fast])
+        assert not_done == set([slow])
+
+    def test_first_exception(self):
+        slow = self.p.send(sleep_and_return, TEST_INTERVAL * 10)
+        ok = self.p.send(sleep_and_return, 0)
+        ng = self.p.send(sleep_and_raise, TEST_INTERVAL)
+
+        start = time.time()
+        done, not_done = thread_utils.wait(
+            [slow, ok, ng], return_when=thread_utils.FIRST_EXCEPTION)
+        assert time.time() - start < TEST_INTERVAL * 5
+        assert done == set([ok, ng])
+        assert not_done == set([slow])
+
+    def test_first_exception_returns_when_all_completed(self):
+        futures = [self.p.send(sleep_and_return, 0) for _ in range(SIZE)]
+
+        done, not_done = thread_utils.wait(
+            futures, return_when=thread_utils.FIRST_EXCEPTION)
+        assert done == set(futures)
+        assert not_done == set()
+
+    def test_timeout(self):
+        slow = self.p.send(sleep_and_return, TEST_INTERVAL * 10)
+        fast = self.p.send(sleep_and_return, 0)
+
+        start = time.time()
+        done, not_done = thread_utils.wait([slow, fast],
+                                           timeout=TEST_INTERVAL)
+        assert TEST_INTERVAL <= time.time() - start < TEST_INTERVAL * 5
+        assert done == set([fast])
+        assert not_done == set([slow])
+
+    def test_works_with_async_future(self):
+        func = thread_utils.async()(sleep_and_return)
+        futures = [func(0) for _ in range(SIZE)]
+
+        done, not_done = thread_utils.wait(futures)
+        assert done == set(futures)
+
+    def test_ValueError_if_return_when_is_invalid(self):
+        with pytest.raises(ValueError):
+            thread_utils.wait([], return_when='foo')
+
+
+class TestAsCompleted(object):
+    """
+    thread_utils.as_completed yields futures in order of finishing.
+    """
+
+    def setup_method(self, method):
+        self.p = thread_utils.Pool(worker_size=SIZE)
+
+    def teardown_method(self, method):
+        self.p.kill()
+
+    def test_yields_in_order_of_finishing(self):
+        args = [TEST_INTERVAL * i for i in range(SIZE - 1, -1, -1)]
+        futures = [self.p.send(sleep_and_return, n) for n in args]
+
+        results = [f.receive() for f in thread_utils.as_completed(futures)]
+        assert results == sorted(args)
+
+    def test_timeout(self):
+        slow = self.p.send(sleep_and_return, TEST_INTERVAL * 10)
+        fast = self.p.send(sleep_and_return, 0)
+
+        it = thread_utils.as_completed([slow, fast], timeout=TEST_INTERVAL)
+        assert next(it) is fast
+        with pytest.raises(thread_utils.TimeoutError):
+            next(it)
+
+
+class TestGather(object):
+    """
+    thread_utils.gather returns the results in order of the futures.
+    """
+
+    def setup_method(self, method):
+        self.p = thread_utils.Pool(worker_size=SIZE)
+
+    def teardown_method(self, method):
+        self.p.kill()
+
+    def test_returns_results_in_order(self):
+        args = [TEST_INTERVAL * i / SIZE for i in range(SIZE - 1, -1, -1)]
+        futures = [self.p.send(sleep_and_return, n) for n in args]
+
+        assert thread_utils.gather(futures) == args
+
+    def test_raises_first_exception_without_waiting_for_others(self):
+        slow = self.p.send(sleep_and_return, TEST_INTERVAL * 10)
+        ng = self.p.send(sleep_and_raise, 0)
+
+        start = time.time()
+        with pytest.raises(RuntimeError):
+            thread_utils.gather([slow, ng])
+        assert time.time() - start < TEST_INTERVAL * 5
+
+    def test_return_exceptions(self):
+        ok = self.p.send(sleep_and_return, 0)
+        ng = self.p.send(sleep_and_raise, 0)
+
+        results = thread_utils.gather([ok, ng], return_exceptions=True)
+        assert results[0] == 0
+        assert isinstance(results[1], RuntimeError)
+
+    def test_timeout(self):
+        slow = self.p.send(sleep_and_return, TEST_INTERVAL * 10)
+
+        with pytest.raises(thread_utils.TimeoutError):
+            thread_utils.gather([slow], timeout=TEST_INTERVAL)
+
+
+def test_waiter_is_unregistered():
+    """
+    Waiting with timeout repeatedly doesn't leave the callbacks.
+    """
+
+    pool = thread_utils.Pool(worker_size=0)
+    f = pool.send(sleep_and_return, 0)
+    g = thread_utils.async()(sleep_and_return)(TEST_INTERVAL)
+
+    for i in range(SIZE):
+        thread_utils.wait([f, g], timeout=0)
+        with pytest.raises(thread_utils.TimeoutError):
+            thread_utils.gather([f, g], timeout=0)
+
+        it = thread_utils.as_completed([f, g], timeout=0)
+        with pytest.raises(thread_utils.TimeoutError):
+            next(it)
+        it = thread_utils.as_completed([f, g])
+        it.close()
+
+    assert not f._PoolFuture__callbacks
+    assert not g._AsyncFuture__callbacks
+
+    pool.cancel()
+    pool.kill()
+    g.receive()
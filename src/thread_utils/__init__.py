@@ -16,7 +16,17 @@ limitations under the License.
 '''
 
 
-from error import Error, TimeoutError, DeadPoolError, CancelError
-from synchronized import synchronized
+from error import (Error, TimeoutError, DeadPoolError, CancelError,
+                   QueueFullError)
+from synchronized import (synchronized, read_synchronized,
+                          write_synchronized)
+from rwlock import RWLock
 from async import async, actor
 from pool import Pool
+from memoize import memoize
+from scheduler import Scheduler
+from process_pool import ProcessPool
+from aio import wrap_future, run_in_pool
+from hooks import Hooks, TraceRecorder
+from wait import (wait, as_completed, gather, FIRST_COMPLETED,
+                  FIRST_EXCEPTION, ALL_COMPLETED)
@@ -17,10 +17,14 @@ limitations under the License.
 
 
 import threading
+import time
+import traceback
 from abc import ABCMeta, abstractmethod
 
+import aio
 import error
 import _gc
+import hooks as _hooks
 
 
 class Future:
@@ -37,6 +41,7 @@ class Future:
     """
 
     __metaclass__ = ABCMeta
+    __slots__ = ()
 
     @abstractmethod
     def is_finished(self):
@@ -63,6 +68,77 @@ class Future:
 
         raise RuntimeError("Abstract method is called.")
 
+    def add_done_callback(self, fn, pool=None):
+        """
+        Invoke callable `fn' with this object as the argument when the task
+        is finished.
+
+        If argument `pool' is None, `fn' is invoked in the thread finishing
+        the task, i.e. the worker thread or the thread which cancels the task.
+        Otherwise, `fn' is sent to thread_utils.Pool `pool' and invoked by its
+        worker. If the task has already been finished, `fn' is invoked (or
+        sent) at once in the caller thread.
+
+        `fn' is invoked exactly once even if the task is canceled. Exception
+        raised by `fn' is printed to stderr and ignored.
+
+          import thread_utils
+
+          def report(future):
+              print future.receive()
+
+          with thread_utils.Pool() as pool:
+              pool.send(pow, 2, 10).add_done_callback(report)
+        """
+
+        # Argument Check
+        if not callable(fn):
+            raise TypeError("The argument 2 'fn' is requested to be "
+                            "callable.")
+
+        if pool is None:
+            self._add_callback(fn)
+        else:
+            self._add_callback(lambda future: pool.send(fn, future))
+
+    def cancel(self):
+        """
+        Cancel the task if it is not started yet, and return True. Otherwise,
+        return False.
+
+        If the task is canceled, this object is finished and receive method
+        raises CancelError. Only the task sent to thread_utils.Pool can be
+        canceled; the callable decorated by thread_utils.async starts at once.
+        """
+
+        return False
+
+    @abstractmethod
+    def _add_callback(self, callback):
+        '''
+        Call `callback' with this object as the argument when the result is
+        set. If the result has already been set, call it at once.
+        '''
+
+        raise RuntimeError("Abstract method is called.")
+
+    @abstractmethod
+    def _remove_callback(self, callback):
+        '''
+        Remove `callback' registered by _add_callback if it has not been
+        called yet.
+        '''
+
+        raise RuntimeError("Abstract method is called.")
+
+    def __await__(self):
+        """
+        Make this object awaitable in asyncio coroutines. (Python 3.5 or
+        later.) See help(thread_utils.wrap_future) for more detail.
+        """
+
+        return aio.wrap_future(self).__await__()
+
 
 class AsyncFuture(Future):
     """
@@ -71,12 +147,19 @@ class AsyncFuture(Future):
     The instance will be created by callable decorated by thread_utils.async.
     """
 
-    __slots__ = ('__worker', '__func', '__result', '__is_error')
+    __slots__ = ('__worker', '__func', '__result', '__is_error', '__lock',
+                 '__callbacks', '__hooks',)
 
-    def __init__(self, func, daemon, *args, **kwargs):
+    def __init__(self, func, daemon, hooks, *args, **kwargs):
         self.__func = func
         self.__result = None
         self.__is_error = None
+        self.__lock = threading.Lock()
+        self.__callbacks = None
+        self.__hooks = hooks
+
+        if hooks is not None:
+            _hooks._invoke(hooks.on_submit, self)
 
         self.__worker = threading.Thread(target=self.__run, args=args,
                                          kwargs=kwargs)
@@ -84,29 +167,68 @@ class AsyncFuture(Future):
         self.__worker.start()
 
     def __run(self, *args, **kwargs):
+        hooks = self.__hooks
         try:
-            self.__result = self.__func(*args, **kwargs)
-            self.__is_error = False
-        except BaseException as e:
-            self.__result = e
-            self.__is_error = True
+            if hooks is not None:
+                _hooks._invoke(hooks.on_worker_spawn)
+                _hooks._invoke(hooks.on_start, self)
+
+            try:
+                self.__set_result(self.__func(*args, **kwargs), False)
+            except BaseException as e:
+                self.__set_result(e, True)
+
+            if hooks is not None:
+                _hooks._invoke(hooks.on_finish, self)
+                _hooks._invoke(hooks.on_worker_exit)
         finally:
             _gc._put(threading.current_thread())
 
+    def __set_result(self, result, is_error):
+        with self.__lock:
+            self.__result = result
+            self.__is_error = is_error
+            callbacks, self.__callbacks = self.__callbacks, None
+
+        if callbacks:
+            _invoke_callbacks(callbacks, self)
+
+    def _add_callback(self, callback):
+        ''' Override '''
+
+        with self.__lock:
+            if self.__is_error is None:
+                if self.__callbacks is None:
+                    self.__callbacks = []
+                self.__callbacks.append(callback)
+                return
+
+        _invoke_callbacks((callback,), self)
+
+    def _remove_callback(self, callback):
+        ''' Override '''
+
+        with self.__lock:
+            _remove(self.__callbacks, callback)
+
     def is_finished(self):
         ''' Override '''
 
-        return not self.__worker.is_alive()
+        # Expect for GIL.
+        return self.__is_error is not None
 
     # pylint: disable=E0702
     def receive(self, timeout=None):
         ''' Override '''
 
-        self.__worker.join(timeout)
+        # Expect for GIL.
+        if self.__is_error is None:
+            self.__worker.join(timeout)
+
+            if self.__is_error is None:
+                raise error.TimeoutError
 
-        if self.__worker.is_alive():
-            raise error.TimeoutError
-        elif self.__is_error:
+        if self.__is_error:
             raise self.__result
         else:
             return self.__result
@@ -120,35 +242,149 @@ class PoolFuture(Future):
     Implement of Future class.
 
     The instance will be created by thread_utils.Pool.send method.
+
+    The instance is kept as small as possible because a lot of them can be
+    queued at the same time. The lock is shared with other instances (see
+    _lock_for) and the object to wait for the result is created only when
+    some thread blocks in receive method. The task is released as soon as it
+    is finished.
     """
 
-    __slots__ = ('__result', '__is_error', '__func', '__args', '__kwargs',
-                 '__lock',)
+    __slots__ = ('__result', '__is_error', '__task', '__waiter',
+                 '__callbacks', '__queued_at', '__canceler',)
 
     def __init__(self, func, *args, **kwargs):
-        self.__lock = threading.Condition(threading.Lock())
-        self.__func = func
-        self.__args = args
-        self.__kwargs = kwargs
+        # Don't keep empty kwargs; a dict is much larger than None.
+        self.__task = (func, args, kwargs or None)
+        self.__queued_at = time.time()
         self.__is_error = None
         self.__result = None
+        self.__waiter = None
+        self.__callbacks = None
+        self.__canceler = None
 
-    def _run(self):
-        try:
-            self._set_result(self.__func(*self.__args, **self.__kwargs), False)
+    def _queued_at(self):
+        ''' Return when this object was created. (i.e. the task was sent.) '''
+
+        return self.__queued_at
+
+    def _touch(self):
+        ''' Set when the task was sent to now. (For the delayed task.) '''
+
+        self.__queued_at = time.time()
+
+    def _set_canceler(self, canceler):
+        '''
+        Set `canceler' to be called with this object when cancel method
+        succeeds. (Pool counts the task canceled by it.)
+        '''
+
+        with _lock_for(self):
+            if self.__is_error is None:
+                self.__canceler = canceler
+
+    def _claim(self):
+        '''
+        Take the task so as not to be canceled, and return it. Return None if
+        the task has been canceled (or claimed) already.
+        '''
+
+        with _lock_for(self):
+            task, self.__task = self.__task, None
+            return task
+
+    def _run(self, task=None):
+        '''
+        Do the task and set the result. Return True if the task raised an
+        exception, False if not, or None if the task has been canceled.
 
+        `task' is the one returned by _claim if it is claimed beforehand.
+        '''
+
+        if task is None:
+            task = self._claim()
+            if task is None:
+                return None
+
+        func, args, kwargs = task
+        del task
+
+        try:
+            if kwargs is None:
+                result = func(*args)
+            else:
+                result = func(*args, **kwargs)
+            is_error = False
         except BaseException as e:
-            self._set_result(e, True)
+            result = e
+            is_error = True
+
+        del func, args, kwargs
+        self._set_result(result, is_error)
+        return is_error
 
     def _set_result(self, result, is_error):
-        self.__lock.acquire()
-        try:
+        '''
+        Set the result, wake up the waiters and invoke the callbacks.
+        Return False if the result has already been set. (The first one wins.)
+        '''
+
+        with _lock_for(self):
+            if self.__is_error is not None:
+                return False
+
             self.__is_error = is_error
             self.__result = result
+            self.__task = None
+            self.__canceler = None
+            waiter, self.__waiter = self.__waiter, None
+            callbacks, self.__callbacks = self.__callbacks, None
 
-        finally:
-            self.__lock.notify_all()
-            self.__lock.release()
+        if waiter is not None:
+            waiter.set()
+
+        if callbacks:
+            _invoke_callbacks(callbacks, self)
+
+        return True
+
+    def cancel(self):
+        ''' Override '''
+
+        with _lock_for(self):
+            # The task is released when it is started or finished.
+            if self.__task is None:
+                return False
+            self.__task = None
+            canceler = self.__canceler
+
+        if not self._set_result(error.CancelError("This task was canceled "
+                                                  "before done."), True):
+            return False
+
+        if canceler is not None:
+            canceler(self)
+        return True
+
+    def _add_callback(self, callback):
+        ''' Override '''
+
+        with _lock_for(self):
+            if self.__is_error is None:
+                if self.__callbacks is None:
+                    self.__callbacks = []
+                self.__callbacks.append(callback)
+                return
+
+        _invoke_callbacks((callback,), self)
+
+    def _remove_callback(self, callback):
+        ''' Override '''
+
+        with _lock_for(self):
+            if not _remove(self.__callbacks, callback):
+                # Don't keep an empty list.
+                self.__callbacks = None
 
     def is_finished(self):
         ''' Override '''
@@ -163,15 +399,14 @@ class PoolFuture(Future):
         # Expect for GIL.
         if self.__is_error is None:
 
-            # Lock and check again before waiting.
-            self.__lock.acquire()
-            try:
-                if self.__is_error is None:
-                    self.__lock.wait(timeout)
-            except Exception:
-                pass
-            finally:
-                self.__lock.release()
+            # Lock and check again before creating the waiter.
+            with _lock_for(self):
+                waiter = self.__waiter
+                if self.__is_error is None and waiter is None:
+                    waiter = self.__waiter = threading.Event()
+
+            if waiter is not None:
+                waiter.wait(timeout)
 
             # Check again (expect for GIL.)
             if self.__is_error is None:
@@ -183,5 +418,41 @@ class PoolFuture(Future):
         else:
             return self.__result
 
+
+_LOCKS = tuple(threading.Lock() for _ in xrange(64))
+
+
+def _lock_for(future):
+    '''
+    Return the lock shared by `future' and some other futures.
+    '''
+
+    # The lowest bits of the address are always 0 because of the alignment.
+    return _LOCKS[(id(future) >> 4) % len(_LOCKS)]
+
 # pylint: disable=E1101
 Future.register(PoolFuture)
+
+
+def _remove(callbacks, callback):
+    '''
+    Remove `callback' from list `callbacks' (or None) if any, and return
+    `callbacks'.
+    '''
+
+    if callbacks:
+        try:
+            callbacks.remove(callback)
+        except ValueError:
+            pass
+
+    return callbacks
+
+
+def _invoke_callbacks(callbacks, future):
+    for c in callbacks:
+        try:
+            c(future)
+        except Exception:
+            # Don't break the worker nor the caller.
+            traceback.print_exc()
@@ -16,19 +16,74 @@ limitations under the License.
 '''
 
 
-import Queue
+import collections
 import threading
 
 
-__TERMINATED = Queue.Queue()
+# Threads which called _put and haven't been joined yet.
+__PENDING = collections.deque()
 
+# Only one thread reaps at a time. The others don't wait for it.
+__LOCK = threading.Lock()
 
-def __gc():
-    while True:
-        __TERMINATED.get().join()
+__reaped = 0
 
-_put = __TERMINATED.put
-__GC = threading.Thread(target=__gc)
-__GC.daemon = True
-__GC.name = "Garbage Collector."
-__GC.start()
+
+def _put(thread):
+    '''
+    Register `thread' to be joined after terminated, and join the pending
+    threads which have been terminated.
+
+    No thread is dedicated to join; the threads calling this function (i.e.
+    finishing workers) join each other in batches. Nothing is done at import
+    time.
+    '''
+
+    # Expect for GIL.
+    __PENDING.append(thread)
+    _collect(False)
+
+
+def _collect(blocking=True):
+    '''
+    Join all the pending threads which have been terminated, and return how
+    many threads are joined. If argument `blocking' is False and another
+    thread is joining, return 0 at once.
+    '''
+
+    global __reaped
+
+    if not __LOCK.acquire(blocking):
+        return 0
+
+    try:
+        count = 0
+        for _ in xrange(len(__PENDING)):
+            thread = __PENDING.popleft()
+            if thread.is_alive():
+                __PENDING.append(thread)
+            else:
+                thread.join()
+                count += 1
+
+        __reaped += count
+        return count
+
+    finally:
+        __LOCK.release()
+
+
+def _pending():
+    '''
+    Return how many threads are waiting to be joined.
+    '''
+
+    return len(__PENDING)
+
+
+def _reaped():
+    '''
+    Return how many threads have been joined.
+    '''
+
+    return __reaped
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import heapq
+import itertools
+
+
+# Priorities of the items which must be dequeued before or after all tasks.
+_FIRST = float('-inf')
+_LAST = float('inf')
+
+
+class TaskQueue(object):
+    """
+    Priority queue of tasks used by thread_utils.Pool.
+
+    Items with smaller priority are dequeued earlier, and items with the same
+    priority are dequeued in FIFO order. The interface is similar to
+    collections.deque, and each method is thread safe as long as priorities
+    are numbers. (Expect for GIL.)
+    """
+
+    __slots__ = ('__heap', '__counter',)
+
+    def __init__(self):
+        # Each element is a tuple (priority, sequence number, item).
+        self.__heap = []
+        self.__counter = itertools.count()
+
+    def append(self, item, priority=0):
+        heapq.heappush(self.__heap, (priority, next(self.__counter), item))
+
+    def extend(self, items, priority=0):
+        for item in items:
+            self.append(item, priority)
+
+    def appendleft(self, item):
+        ''' Queue item to be dequeued before all the others. '''
+
+        self.append(item, _FIRST)
+
+    def append_last(self, item):
+        '''
+        Queue item to be dequeued after all the others, including items to be
+        queued later.
+        '''
+
+        self.append(item, _LAST)
+
+    def popleft(self):
+        ''' Dequeue the first item, or raise IndexError if empty. '''
+
+        return heapq.heappop(self.__heap)[2]
+
+    def peekleft(self):
+        ''' Return the first item without dequeueing, or raise IndexError. '''
+
+        return self.__heap[0][2]
+
+    def popleft_task(self):
+        '''
+        Dequeue the first item except for None, or raise IndexError if no
+        such item is. None (stop signal) is left with the same priority.
+        '''
+
+        stop_signals = []
+        try:
+            while True:
+                entry = heapq.heappop(self.__heap)
+                if entry[2] is not None:
+                    return entry[2]
+                stop_signals.append(entry)
+
+        finally:
+            for entry in stop_signals:
+                heapq.heappush(self.__heap, entry)
+
+    def drain(self):
+        '''
+        Dequeue all items except for None, and return them as a list.
+
+        None (stop signal) is left with the same priority.
+        '''
+
+        items = []
+        stop_signals = []
+
+        while True:
+            try:
+                entry = heapq.heappop(self.__heap)
+            except IndexError:
+                break
+
+            if entry[2] is None:
+                stop_signals.append(entry)
+            else:
+                items.append(entry[2])
+
+        for entry in stop_signals:
+            heapq.heappush(self.__heap, entry)
+
+        return items
+
+    def __len__(self):
+        return len(self.__heap)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Token bucket to limit the rate of something.
+
+    Tokens are added `rate' per second up to `burst', and one token is taken
+    for each thing to do. The bucket is full at first.
+    """
+
+    __slots__ = ('__rate', '__burst', '__tokens', '__updated_at', '__lock',)
+
+    def __init__(self, rate, burst):
+        self.__rate = float(rate)
+        self.__burst = float(burst)
+        self.__tokens = self.__burst
+        self.__updated_at = time.time()
+        self.__lock = threading.Lock()
+
+    def take(self):
+        '''
+        Take a token and return 0. If no token is left, return how many
+        seconds it takes until a token is added.
+        '''
+
+        with self.__lock:
+            now = time.time()
+            # The system clock can go back.
+            elapsed = max(now - self.__updated_at, 0)
+            self.__tokens = min(self.__burst,
+                                self.__tokens + elapsed * self.__rate)
+            self.__updated_at = now
+
+            if self.__tokens >= 1:
+                self.__tokens -= 1
+                return 0
+
+            return (1 - self.__tokens) / self.__rate
+
+    def refund(self):
+        ''' Put back the token taken but not used. '''
+
+        with self.__lock:
+            self.__tokens = min(self.__burst, self.__tokens + 1)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import time
+
+
+# Histogram bucket i counts durations in [2 ** (i - 1), 2 ** i) microseconds.
+# (Bucket 0 counts ones shorter than 1 microsecond, and the last bucket counts
+# ones longer than the others.)
+_BUCKETS = 40
+
+
+class Histogram(object):
+    """
+    Histogram of durations with log2 scale buckets.
+    """
+
+    __slots__ = ('__counts', '__sum',)
+
+    def __init__(self):
+        self.__counts = [0] * _BUCKETS
+        self.__sum = 0.0
+
+    def add(self, seconds):
+        i = int(max(seconds, 0) * 1000000).bit_length()
+        self.__counts[min(i, _BUCKETS - 1)] += 1
+        self.__sum += seconds
+
+    def merge(self, other):
+        for i, c in enumerate(other.__counts):
+            self.__counts[i] += c
+        self.__sum += other.__sum
+
+    def snapshot(self):
+        '''
+        Return dict {'count': int, 'sum': seconds, 'buckets': list}.
+        Each element of 'buckets' is tuple (upper bound seconds, count) of a
+        non-empty bucket. The upper bound of the last bucket is None.
+        '''
+
+        buckets = []
+        for i, c in enumerate(self.__counts):
+            if c:
+                upper = 2 ** i / 1000000.0 if i < _BUCKETS - 1 else None
+                buckets.append((upper, c))
+
+        return {'count': sum(self.__counts), 'sum': self.__sum,
+                'buckets': buckets}
+
+
+class WorkerStats(object):
+    """
+    Statistics of a worker of thread_utils.Pool.
+
+    Each instance is updated only by the owner worker without lock.
+    """
+
+    __slots__ = ('started_at', 'submitted', 'completed', 'failed', 'busy',
+                 'queue_wait', 'run_time',)
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.submitted = 0  # Tasks sent to own queue in work stealing mode.
+        self.completed = 0  # Tasks finished without an exception.
+        self.failed = 0  # Tasks finished with an exception.
+        self.busy = 0.0  # Seconds to do the tasks.
+        self.queue_wait = Histogram()
+        self.run_time = Histogram()
+
+    def record(self, queued_at, started_at, finished_at, is_error):
+        ''' Record a task done by the owner worker. '''
+
+        if is_error:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+        run_time = finished_at - started_at
+        self.busy += run_time
+        self.queue_wait.add(started_at - queued_at)
+        self.run_time.add(run_time)
+
+    def merge(self, other):
+        self.submitted += other.submitted
+        self.completed += other.completed
+        self.failed += other.failed
+        self.busy += other.busy
+        self.queue_wait.merge(other.queue_wait)
+        self.run_time.merge(other.run_time)
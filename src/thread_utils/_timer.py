@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import atexit
+import heapq
+import itertools
+import os
+import select
+import threading
+import time
+import traceback
+
+import _gc
+
+
+# Heap of the timers. Each element is a tuple (when, sequence number, func,
+# arg).
+__HEAP = []
+__COUNTER = itertools.count()
+__LOCK = threading.Lock()
+
+# The timer thread is started when a timer is scheduled, and exits when no
+# timer is left.
+__thread = None
+__is_stopped = False
+
+# The timer thread sleeps in select on this pipe, because a timed wait of
+# threading.Condition polls on Python 2 and would delay an earlier timer
+# scheduled meanwhile. Writing a byte wakes it up. Created on demand.
+__pipe = None
+
+# The timer thread is sleeping and nobody has woken it up yet.
+__is_sleeping = False
+
+
+def _schedule(when, func, arg):
+    '''
+    Call func(arg) in the timer thread at `when'. (Compared with time.time().)
+
+    All timers share one thread, so `func' is requested to return soon.
+    Exception raised by `func' is printed to stderr and ignored.
+    '''
+
+    global __thread, __pipe
+
+    with __LOCK:
+        if __thread is None:
+            if __pipe is None:
+                __pipe = os.pipe()
+            __thread = threading.Thread(target=__run)
+            __thread.daemon = True
+            __thread.start()
+
+        entry = (when, next(__COUNTER), func, arg)
+        heapq.heappush(__HEAP, entry)
+
+        # Wake up the timer thread if the earliest timer is changed.
+        if __HEAP[0] is entry:
+            __wake()
+
+
+def __wake():
+    '''
+    Wake up the timer thread if it is sleeping.
+    This function must be called under the lock.
+    '''
+
+    global __is_sleeping
+
+    if __is_sleeping:
+        __is_sleeping = False
+        os.write(__pipe[1], b'x')
+
+
+def __sleep(timeout):
+    ''' Sleep until `timeout' seconds pass or __wake is called. '''
+
+    global __is_sleeping
+
+    readable, _, _ = select.select([__pipe[0]], [], [], timeout)
+    if readable:
+        os.read(__pipe[0], 64)
+
+    with __LOCK:
+        __is_sleeping = False
+
+
+def __run():
+    global __thread, __is_sleeping
+
+    while True:
+        with __LOCK:
+            if __is_stopped:
+                return
+
+            if not __HEAP:
+                # _schedule starts another thread next time.
+                __thread = None
+                break
+
+            now = time.time()
+            timeout = __HEAP[0][0] - now
+            due = []
+            while __HEAP and __HEAP[0][0] <= now:
+                due.append(heapq.heappop(__HEAP))
+
+            if not due:
+                __is_sleeping = True
+
+        if not due:
+            __sleep(timeout)
+            continue
+
+        for when, _, func, arg in due:
+            try:
+                func(arg)
+            except BaseException:
+                traceback.print_exc()
+
+        # Don't keep the arguments while waiting.
+        due = func = arg = None
+
+    _gc._put(threading.current_thread())
+
+
+def _pending():
+    '''
+    Return how many timers are waiting.
+    '''
+
+    return len(__HEAP)
+
+
+@atexit.register
+def __stop():
+    '''
+    Stop the timer thread. The thread calling the timers can't exit safely
+    after the interpreter starts to finalize the modules.
+    '''
+
+    global __is_stopped
+
+    with __LOCK:
+        __is_stopped = True
+        __wake()
+        thread = __thread
+
+    if thread is not None:
+        thread.join(1.0)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+try:
+    import asyncio
+except ImportError:
+    # Python 2.7 and 3.3 don't have asyncio.
+    asyncio = None
+
+
+def wrap_future(future, loop=None):
+    """
+    Wrap a Future object of thread_utils and return asyncio.Future which is
+    done when the wrapped future is finished.
+
+    Argument `future' is a Future object created by thread_utils.Pool.send
+    method or callable decorated by thread_utils.async. Argument `loop' is the
+    event loop to which the result is delivered. The default is the event
+    loop of the current thread. The result is delivered from the worker
+    thread by loop.call_soon_threadsafe, so no thread blocks for waiting.
+
+    In python 3.5 or later, the Future objects of thread_utils are awaitable;
+    "await future" is same to "await thread_utils.wrap_future(future)".
+
+    This function raises ImportError if asyncio is not available.
+    """
+
+    if asyncio is None:
+        raise ImportError("asyncio is not available.")
+
+    if loop is None:
+        loop = asyncio.get_event_loop()
+
+    aio_future = loop.create_future() if hasattr(loop, 'create_future') \
+        else asyncio.Future(loop=loop)
+
+    def callback(f):
+        # Called in the worker thread.
+        loop.call_soon_threadsafe(_copy_result, f, aio_future)
+
+    future._add_callback(callback)
+    return aio_future
+
+
+def _copy_result(future, aio_future):
+    # Called in the event loop.
+    if aio_future.cancelled():
+        return
+
+    try:
+        # future is finished, so receive method never blocks.
+        aio_future.set_result(future.receive())
+    except BaseException as e:
+        aio_future.set_exception(e)
+
+
+def run_in_pool(pool, func, *args, **kwargs):
+    """
+    Send the blocking callable `func' to `pool' and return asyncio.Future of
+    the result.
+
+    It is a shortcut of wrap_future(pool.send(func, *args, **kwargs)).
+
+       import asyncio
+       import thread_utils
+
+       pool = thread_utils.Pool(worker_size=4)
+
+       async def handler(path):
+           data = await thread_utils.run_in_pool(pool, read_file, path)
+           return parse(data)
+
+    This function raises ImportError if asyncio is not available.
+    """
+
+    return wrap_future(pool.send(func, *args, **kwargs))
@@ -16,13 +16,34 @@ limitations under the License.
 '''
 
 
+import atexit
 import functools
 import operator
+import threading
+import time
+import weakref
 
 import _future
+import hooks as _hooks
+import pool
 
 
-def async(daemon=True):
+# The upper limit of the worker size of each cached pool.
+_CACHED_MAX_WORKERS = 256
+
+# How long an idle cached worker lives. Non-daemon workers prevent the program
+# from exiting, so they retire soon.
+_CACHED_IDLE_TIMEOUT = {True: 60.0, False: 1.0}
+
+_cached_pools = {}
+_cached_pools_lock = threading.Lock()
+
+# Pools of the callables decorated with max_concurrent.
+_limited_pools = weakref.WeakSet()
+
+
+def async(daemon=True, cached=False, hooks=None, max_concurrent=None,
+          max_queue_size=0, queue_policy='block'):
     """
     Decorator that creates a worker thread and invokes callable there.
 
@@ -86,8 +107,63 @@ def async(daemon=True):
 
     This decorator doesn't affect to thread safty, so it depends on the invoked
     callable whether decorated will be thread safe or not.
+
+    If argument `cached' is True, the callable is invoked in a worker of the
+    elastic thread_utils.Pool shared by all the callables decorated with the
+    same `daemon'. Idle workers are reused instead of creating a new thread
+    for each call, so it is much faster for short tasks. The number of the
+    workers is limited to 256; if all of them are busy, the task is queued
+    until any of them gets idle. An idle worker retires after 60 seconds (or 1
+    second for non-daemon workers.)
+    Don't make cached callables wait for each other; it can deadlock if all
+    the workers are waiting.
+
+    Argument `hooks' is an instance of thread_utils.Hooks notified of the
+    lifecycle of each call. See help(thread_utils.Hooks) for the details.
+    Cached callables with different `hooks' don't share the pool.
+
+    If argument `max_concurrent' is not None, at most `max_concurrent' calls
+    of the decorated callable run at the same time, and the others are queued
+    until any of them finishes. The returned Future object is not finished
+    while the call is queued. Argument `max_queue_size' specifies how many
+    calls can be queued (0 means unlimited), and `queue_policy' specifies
+    what to do when the queue is full. (See help(thread_utils.Pool) for the
+    details.) The calls are run by an elastic thread_utils.Pool owned by the
+    decorated callable, so idle threads are reused as argument `cached' is
+    True.
+
+       import thread_utils
+       import urllib2
+
+       # Don't create more than 10 threads however many urls are passed.
+       @thread_utils.async(max_concurrent=10)
+       def fetch(url):
+           return urllib2.urlopen(url).read()
+
+       futures = [fetch(url) for url in urls]
     """
 
+    # Argument Check
+    if hooks is not None and not isinstance(hooks, _hooks.Hooks):
+        raise TypeError("The argument 3 'hooks' is requested to be an "
+                        "instance of thread_utils.Hooks.")
+
+    if max_concurrent is None:
+        if max_queue_size != 0 or queue_policy != 'block':
+            raise ValueError("The argument 'max_queue_size' and "
+                             "'queue_policy' are available only when "
+                             "'max_concurrent' is specified.")
+    else:
+        if not isinstance(max_concurrent, int):
+            raise TypeError("The argument 4 'max_concurrent' is requested to "
+                            "be int.")
+        if max_concurrent < 1:
+            raise ValueError("The argument 4 'max_concurrent' is requested to "
+                             "be 1 or larger than 1.")
+        if cached:
+            raise ValueError("The argument 'cached' and 'max_concurrent' "
+                             "can't be specified at the same time.")
+
     def decorator(func):
 
         # Argument Check
@@ -95,15 +171,94 @@ def async(daemon=True):
             raise TypeError("The 1st argument 'func' is requested "
                             "to be callable.")
 
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
+        if cached:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+
+                return _cached_pool(operator.truth(daemon), hooks).send(
+                    func, *args, **kwargs)
+
+        elif max_concurrent is not None:
+            p = _limited_pool(operator.truth(daemon), hooks, max_concurrent,
+                              max_queue_size, queue_policy)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+
+                return p.send(func, *args, **kwargs)
+
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
 
-            return _future.AsyncFuture(func, operator.truth(daemon), *args,
-                                       **kwargs)
+                return _future.AsyncFuture(func, operator.truth(daemon),
+                                           hooks, *args, **kwargs)
 
         return wrapper
 
     return decorator
 
 
+def _cached_pool(daemon, hooks=None):
+    '''
+    Return the pool shared by the cached callables with the same `daemon' and
+    `hooks'. Create it if necessary.
+    '''
+
+    key = (daemon, hooks)
+
+    # Expect for GIL.
+    ret = _cached_pools.get(key)
+    if ret is not None:
+        return ret
+
+    with _cached_pools_lock:
+        ret = _cached_pools.get(key)
+        if ret is None:
+            ret = pool.Pool(daemon=daemon, max_workers=_CACHED_MAX_WORKERS,
+                            idle_timeout=_CACHED_IDLE_TIMEOUT[daemon],
+                            hooks=hooks)
+            _cached_pools[key] = ret
+
+        return ret
+
+
+def _limited_pool(daemon, hooks, max_concurrent, max_queue_size,
+                  queue_policy):
+    ''' Create a pool for a callable decorated with max_concurrent. '''
+
+    ret = pool.Pool(daemon=daemon, max_workers=max_concurrent,
+                    idle_timeout=_CACHED_IDLE_TIMEOUT[daemon], hooks=hooks,
+                    max_queue_size=max_queue_size, queue_policy=queue_policy)
+
+    with _cached_pools_lock:
+        _limited_pools.add(ret)
+
+    return ret
+
+
+@atexit.register
+def _kill_cached_pools():
+    '''
+    Kill the cached pools and wait for a while the idle workers to exit.
+    Workers woken (e.g. to retire) after the interpreter starts to finalize
+    the modules can't exit safely.
+    '''
+
+    with _cached_pools_lock:
+        pools = list(_cached_pools.values()) + list(_limited_pools)
+
+    for p in pools:
+        p.kill()
+
+    # Don't wait for the busy workers.
+    deadline = time.time() + 1.0
+    for p in pools:
+        while time.time() < deadline:
+            worker_size, tasks_being_done = p.inspect()[:2]
+            if worker_size <= tasks_being_done:
+                break
+            time.sleep(0.01)
+
+
 actor = async
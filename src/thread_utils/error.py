@@ -25,8 +25,16 @@ class TimeoutError(Error):
 
 
 class DeadPoolError(Error):
-    pass
+    # Futures queued by Pool.send_many or Pool.send_batch before this error
+    # is raised. They are done as usual.
+    queued = ()
 
 
 class CancelError(Error):
     pass
+
+
+class QueueFullError(Error):
+    # Futures queued by Pool.send_many or Pool.send_batch before this error
+    # is raised. They are done as usual.
+    queued = ()
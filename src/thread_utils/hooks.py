@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import itertools
+import json
+import os
+import threading
+import time
+import traceback
+
+
+class Hooks(object):
+    """
+    Base class of the callbacks invoked at each point of the task lifecycle.
+
+    Pass an instance of a subclass to argument `hooks' of thread_utils.Pool or
+    thread_utils.async, and override the methods to be notified. Each method
+    does nothing by default.
+
+    The methods are invoked in the thread where the event occurs without any
+    lock; they must be thread safe and should return soon. Exception raised by
+    them is printed to stderr and ignored.
+    """
+
+    __slots__ = ()
+
+    def on_submit(self, future):
+        """
+        Invoked in the sender thread just before the task is queued. (Or just
+        before the thread is started by thread_utils.async.)
+        """
+
+    def on_start(self, future):
+        """ Invoked in the worker thread just before the task is started. """
+
+    def on_finish(self, future):
+        """
+        Invoked in the worker thread after the task is finished and the
+        result is set. `future.receive()' doesn't block here.
+        """
+
+    def on_cancel(self, future):
+        """
+        Invoked in the thread which canceled the task by Pool.cancel,
+        Pool.kill or Future.cancel. It is invoked in the sender thread, too,
+        if the task is not queued after on_submit because the queue is full or
+        the pool is killed.
+        """
+
+    def on_worker_spawn(self):
+        """ Invoked in a new worker thread before it does any task. """
+
+    def on_worker_exit(self):
+        """ Invoked in a worker thread just before it exits. """
+
+
+def _invoke(method, *args):
+    try:
+        method(*args)
+    except Exception:
+        # Don't break the worker nor the sender.
+        traceback.print_exc()
+
+
+class TraceRecorder(Hooks):
+    """
+    Hooks recording the task lifecycle in the Chrome trace event format,
+    which can be shown by chrome://tracing or Perfetto.
+
+    Each task is shown as a slice named 'task' in the track of the worker
+    thread, and the time from when it is sent until it is started is shown as
+    an async slice named 'queued'. Worker spawn, exit and task cancel are
+    shown as instant events.
+
+      import thread_utils
+
+      recorder = thread_utils.TraceRecorder()
+      with thread_utils.Pool(worker_size=4, hooks=recorder) as pool:
+          pool.map(do_something, xrange(100))
+
+      recorder.save('trace.json')
+    """
+
+    __slots__ = ('__events', '__tasks', '__counter', '__pid',)
+
+    def __init__(self):
+        self.__events = []
+        # { id(future): (task id, started time or None) }
+        self.__tasks = {}
+        self.__counter = itertools.count()
+        self.__pid = os.getpid()
+
+    def __append(self, name, ph, ts=None, **kwargs):
+        if ts is None:
+            ts = time.time() * 1000000
+
+        kwargs.update(name=name, ph=ph, ts=ts, pid=self.__pid,
+                      tid=threading.current_thread().ident)
+        # list.append is thread safe. (Expect for GIL.)
+        self.__events.append(kwargs)
+
+    def on_submit(self, future):
+        task_id = next(self.__counter)
+        self.__tasks[id(future)] = (task_id, None)
+        self.__append('queued', 'b', cat='task', id=task_id)
+
+    def on_start(self, future):
+        task_id = self.__tasks.get(id(future), (None,))[0]
+        if task_id is not None:
+            self.__append('queued', 'e', cat='task', id=task_id)
+        self.__tasks[id(future)] = (task_id, time.time() * 1000000)
+
+    def on_finish(self, future):
+        task_id, started = self.__tasks.pop(id(future), (None, None))
+        if started is None:
+            return
+
+        try:
+            future.receive()
+            is_error = False
+        except BaseException:
+            is_error = True
+
+        self.__append('task', 'X', ts=started, cat='task',
+                      dur=time.time() * 1000000 - started,
+                      args={'id': task_id, 'error': is_error})
+
+    def on_cancel(self, future):
+        task_id, _ = self.__tasks.pop(id(future), (None, None))
+        if task_id is not None:
+            self.__append('queued', 'e', cat='task', id=task_id)
+        self.__append('cancel', 'i', s='t', args={'id': task_id})
+
+    def on_worker_spawn(self):
+        self.__append('thread_name', 'M',
+                      args={'name': threading.current_thread().name})
+        self.__append('worker spawn', 'i', s='t')
+
+    def on_worker_exit(self):
+        self.__append('worker exit', 'i', s='t')
+
+    def events(self):
+        """ Return the list of the recorded trace events. """
+
+        return list(self.__events)
+
+    def dump(self, fp):
+        """ Write the recorded events to file object `fp' in JSON. """
+
+        json.dump({'traceEvents': self.events(), 'displayTimeUnit': 'ms'},
+                  fp)
+
+    def save(self, path):
+        """ Write the recorded events to file `path' in JSON. """
+
+        with open(path, 'w') as f:
+            self.dump(f)
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import collections
+import functools
+import threading
+import time
+
+import _future
+import pool as _pool
+
+
+# Separates args and kwargs in the default key.
+_KWARGS_MARK = object()
+
+
+def memoize(func=None, maxsize=128, ttl=None, pool=None, key=None):
+    """
+    Decorator to cache the results of the callable.
+
+    Concurrent calls with the same arguments share one computation; the first
+    caller computes the result and the others wait for it, so that an
+    expensive lookup is not done many times at the same time even when the
+    cache is missed.
+
+      import thread_utils
+
+      @thread_utils.memoize(maxsize=1024, ttl=60)
+      def lookup(name):
+          return expensive_lookup(name)
+
+    Argument `maxsize' is the number of the results to be cached. The least
+    recently used one is evicted when it is exceeded. If it is None, the cache
+    can grow without bound.
+
+    Argument `ttl' is how many seconds each result is cached after it is
+    computed. If it is None, the result never expires.
+
+    If argument `pool' is an instance of thread_utils.Pool, the result is
+    computed by the pool and the decorated callable returns a Future object
+    shared by the concurrent callers. Otherwise, the result is computed by
+    the caller and the decorated callable returns the result itself.
+
+    Argument `key' is a callable which takes the same arguments as the
+    decorated callable and returns a hashable key. By default, the key is
+    made of the arguments, which are requested to be hashable then.
+
+    An exception raised by the callable is passed to the callers sharing the
+    computation, however it is not cached.
+
+    The decorated callable has the following methods.
+
+    - cache_info(): Return a dict of 'hits', 'misses', 'evictions' (including
+      the expired results), 'currsize' and 'maxsize'.
+    - cache_clear(): Delete all the cached results and reset the counters.
+      The callers waiting for a computation receive its result anyway.
+    """
+
+    # Argument Check
+    if maxsize is not None:
+        if isinstance(maxsize, bool) or not isinstance(maxsize, (int, long)):
+            raise TypeError("The argument 'maxsize' is requested to be int "
+                            "or None.")
+        if maxsize < 1:
+            raise ValueError("The argument 'maxsize' is requested to be 1 or "
+                             "larger than 1.")
+
+    if ttl is not None and not ttl > 0:
+        raise ValueError("The argument 'ttl' is requested to be larger than "
+                         "0.")
+
+    if pool is not None and not isinstance(pool, _pool.Pool):
+        raise TypeError("The argument 'pool' is requested to be an instance "
+                        "of thread_utils.Pool.")
+
+    if key is not None and not callable(key):
+        raise TypeError("The argument 'key' is requested to be callable.")
+
+    if func is None:
+        return lambda f: memoize(f, maxsize, ttl, pool, key)
+
+    if not callable(func):
+        raise TypeError("The argument 'func' is requested to be callable.")
+
+    cache = _Cache(func, maxsize, ttl, pool, key)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return cache.call(args, kwargs)
+
+    wrapper.cache_info = cache.info
+    wrapper.cache_clear = cache.clear
+    return wrapper
+
+
+def _make_key(*args, **kwargs):
+    if not kwargs:
+        return args
+    return args + (_KWARGS_MARK,) + tuple(sorted(kwargs.items()))
+
+
+class _Cache(object):
+    '''
+    Results of the memoized callable.
+
+    Each entry is a list of the Future object and when it expires. (None while
+    it is being computed, or if the result never expires.)
+    '''
+
+    __slots__ = ('__func', '__maxsize', '__ttl', '__pool', '__key', '__lock',
+                 '__entries', '__hits', '__misses', '__evictions',)
+
+    def __init__(self, func, maxsize, ttl, pool, key):
+        self.__func = func
+        self.__maxsize = maxsize
+        self.__ttl = ttl
+        self.__pool = pool
+        self.__key = key or _make_key
+        self.__lock = threading.Lock()
+        # { key: [Future, expires_at] } in the order of use.
+        self.__entries = collections.OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def call(self, args, kwargs):
+        k = self.__key(*args, **kwargs)
+
+        with self.__lock:
+            entry = self.__entries.pop(k, None)
+            if entry is not None and entry[1] is not None and \
+                    entry[1] <= time.time():
+                entry = None
+                self.__evictions += 1
+
+            if entry is not None:
+                self.__hits += 1
+                self.__entries[k] = entry
+                future = entry[0]
+                computes = False
+            else:
+                self.__misses += 1
+                future = _future.PoolFuture(self.__func, *args, **kwargs)
+                self.__entries[k] = [future, None]
+                if self.__maxsize is not None and \
+                        len(self.__entries) > self.__maxsize:
+                    self.__entries.popitem(last=False)
+                    self.__evictions += 1
+                computes = True
+
+        if computes:
+            future._add_callback(lambda f: self.__done(k, f))
+            if self.__pool is None:
+                future._run()
+            else:
+                self.__send(future)
+
+        if self.__pool is None:
+            return future.receive()
+        return future
+
+    def __send(self, future):
+        ''' Compute the result of `future' by the pool. '''
+
+        def propagate(f):
+            # The pool future fails only if it is canceled; the error of the
+            # callable is set to `future' by itself.
+            try:
+                f.receive()
+            except BaseException as e:
+                future._set_result(e, True)
+
+        try:
+            self.__pool.send(future._run)._add_callback(propagate)
+        except BaseException as e:
+            future._set_result(e, True)
+            raise
+
+    def __done(self, k, future):
+        ''' Callback of the computation. '''
+
+        try:
+            future.receive()
+            is_error = False
+        except BaseException:
+            is_error = True
+
+        with self.__lock:
+            entry = self.__entries.get(k)
+            if entry is None or entry[0] is not future:
+                # Evicted or cleared.
+                return
+
+            if is_error:
+                del self.__entries[k]
+            elif self.__ttl is not None:
+                entry[1] = time.time() + self.__ttl
+
+    def info(self):
+        with self.__lock:
+            return {'hits': self.__hits, 'misses': self.__misses,
+                    'evictions': self.__evictions,
+                    'currsize': len(self.__entries),
+                    'maxsize': self.__maxsize}
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__hits = 0
+            self.__misses = 0
+            self.__evictions = 0
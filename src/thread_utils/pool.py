@@ -16,14 +16,49 @@ limitations under the License.
 '''
 
 
+import Queue
 import collections
 import threading
 import operator
 import sys
+import time
+import weakref
 
 import _future
 import _gc
+import _queue
+import _ratelimit
+import _stats
+import _timer
 import error
+import hooks as _hooks
+
+
+# Behaviors of Pool.send and so on when the queue is full.
+_QUEUE_POLICIES = ('block', 'reject', 'caller_runs', 'drop_oldest')
+
+
+class Inspection(tuple):
+    '''
+    Tuple (worker size, tasks currently being done, queued undone tasks)
+    returned by Pool.inspect.
+
+    Attribute `rejected_tasks' is how many tasks were rejected because the
+    queue was full.
+    '''
+
+    def __new__(cls, worker_size, tasks_being_done, queued_tasks,
+                rejected_tasks):
+        self = tuple.__new__(cls, (worker_size, tasks_being_done,
+                                   queued_tasks))
+        self.rejected_tasks = rejected_tasks
+        return self
+
+
+def _call_with_results(futures, func, args, kwargs):
+    ''' Call `func' with the results of finished `futures' and `args'. '''
+
+    return func(*([f.receive() for f in futures] + list(args)), **kwargs)
 
 
 class Pool(object):
@@ -49,9 +84,39 @@ class Pool(object):
         '__lock',  # exclusive lock (Condition).
         '__is_killed',  # whether pool is killed or not.
         '__stop_signals',  # How many stop signals are queued.
+        '__idle_workers',  # How many workers are waiting for task.
+        '__work_stealing',  # Workers have own queue or not.
+        '__local_queues',  # dict of worker queues. { thread_id: deque }
+        '__max_queue_size',  # Max size of self.__futures. 0 is unlimited.
+        '__queue_policy',  # What to do when self.__futures is full.
+        '__block_timeout',  # How long to block when self.__futures is full.
+        '__not_full',  # Condition to wait for self.__futures not to be full.
+        '__blocked_senders',  # How many threads wait for self.__not_full.
+        '__rejected_tasks',  # How many tasks are rejected for the full queue.
+        '__min_workers',  # Min worker size in elastic mode.
+        '__max_workers',  # Max worker size in elastic mode, or None.
+        '__idle_timeout',  # How long an idle worker lives in elastic mode.
+        '__retire_at',  # When the timer wakes up the idle workers, or None.
+        '__starting_workers',  # How many workers are created and not run yet.
+        '__worker_stats',  # dict of statistics. { thread_id: WorkerStats }
+        '__retired_stats',  # WorkerStats of the workers exited.
+        '__submitted_tasks',  # How many tasks are queued to self.__futures.
+        '__canceled_tasks',  # How many tasks are canceled.
+        '__recycled_workers',  # How many workers are recreated by loop_count.
+        '__peak_queued_tasks',  # Max number of tasks in self.__futures.
+        '__hooks',  # thread_utils.Hooks instance or None.
+        '__bucket',  # TokenBucket to limit the rate to start tasks, or None.
+        '__delayed',  # set of Futures sent by send_at or send_dependent and
+                      # not queued yet.
+        '__canceler',  # Function called when a task is canceled by
+                       # Future.cancel. It refers self weakly.
+        '__weakref__',
     )
 
-    def __init__(self, worker_size=1, loop_count=sys.maxint, daemon=True):
+    def __init__(self, worker_size=1, loop_count=sys.maxint, daemon=True,
+                 work_stealing=False, max_queue_size=0, queue_policy='block',
+                 block_timeout=None, min_workers=None, max_workers=None,
+                 idle_timeout=None, hooks=None, rate_limit=None, burst=1):
         """
         All arguments are optional.
 
@@ -62,6 +127,46 @@ class Pool(object):
 
         If argument `daemon' is True, the worker threads will be daemonic, or
         not. Python program exits when only daemon threads are left.
+
+        If argument `work_stealing' is True, each worker owns a local queue.
+        Tasks sent from a task running in the pool are queued to the local
+        queue of the worker, and the worker does the newest one in its local
+        queue first. A worker with nothing to do steals the oldest task from
+        the local queue of another worker. It suits for recursive tasks which
+        send sub-tasks to the same pool.
+
+        Argument `max_queue_size' specifies how many undone tasks can be
+        queued. (0 means unlimited.) Argument `queue_policy' specifies what
+        to do when a task is sent to the full queue. It is one of the
+        followings.
+
+          'block': Block until the queue has a room. If argument
+                   `block_timeout' is not None, raise QueueFullError after
+                   `block_timeout' seconds.
+          'reject': Raise QueueFullError.
+          'caller_runs': Do the task in the sender thread and return the
+                         finished Future object.
+          'drop_oldest': Cancel the oldest queued task and queue the new one.
+
+        Tasks sent from a worker in work stealing mode are not limited.
+
+        If argument `max_workers' is not None, the pool is elastic and
+        argument `worker_size' is ignored. The pool starts with `min_workers'
+        workers (0 by default), and a new worker is created when a task is
+        sent and no worker is idle until the worker size reaches
+        `max_workers'. If argument `idle_timeout' is not None, a worker idle
+        for `idle_timeout' seconds kills itself unless the worker size is
+        `min_workers'.
+
+        Argument `hooks' is an instance of thread_utils.Hooks notified of the
+        lifecycle of the tasks and the workers. See help(thread_utils.Hooks)
+        for the details.
+
+        If argument `rate_limit' is not None, workers start at most
+        `rate_limit' tasks per second on average, and at most `burst' tasks
+        at once after they have been idle. Workers waiting for the rate limit
+        don't occupy the tasks, so the worker size is only for the
+        concurrency.
         """
 
         # Argument Check
@@ -79,40 +184,169 @@ class Pool(object):
             raise ValueError("The argument 3 'loop_count' is requested to be 1"
                              " or larger than 1.")
 
+        if not isinstance(max_queue_size, int):
+            raise TypeError("The argument 6 'max_queue_size' is requested "
+                            "to be int.")
+        if max_queue_size < 0:
+            raise ValueError("The argument 6 'max_queue_size' is requested 0 "
+                             "or larger than 0.")
+
+        if queue_policy not in _QUEUE_POLICIES:
+            raise ValueError("The argument 7 'queue_policy' is requested to "
+                             "be one of %s." % (_QUEUE_POLICIES,))
+
+        if block_timeout is not None and block_timeout < 0:
+            raise ValueError("The argument 8 'block_timeout' is requested 0 "
+                             "or larger than 0.")
+
+        if max_workers is None:
+            if min_workers is not None or idle_timeout is not None:
+                raise ValueError("The argument 'min_workers' and "
+                                 "'idle_timeout' are available only when "
+                                 "'max_workers' is specified.")
+        else:
+            if min_workers is None:
+                min_workers = 0
+            if not isinstance(min_workers, int) or \
+                    not isinstance(max_workers, int):
+                raise TypeError("The argument 'min_workers' and "
+                                "'max_workers' are requested to be int.")
+            if not 0 <= min_workers <= max_workers or max_workers < 1:
+                raise ValueError("The argument 'min_workers' and "
+                                 "'max_workers' are requested to be "
+                                 "0 <= min_workers <= max_workers and "
+                                 "1 <= max_workers.")
+            if idle_timeout is not None and idle_timeout <= 0:
+                raise ValueError("The argument 'idle_timeout' is requested "
+                                 "to be larger than 0.")
+            worker_size = min_workers
+
+        if hooks is not None and not isinstance(hooks, _hooks.Hooks):
+            raise TypeError("The argument 'hooks' is requested to be an "
+                            "instance of thread_utils.Hooks.")
+
+        if rate_limit is not None:
+            if isinstance(rate_limit, bool) or \
+                    not isinstance(rate_limit, (int, long, float)):
+                raise TypeError("The argument 'rate_limit' is requested to "
+                                "be a number.")
+            if not rate_limit > 0:
+                raise ValueError("The argument 'rate_limit' is requested to "
+                                 "be larger than 0.")
+            if not isinstance(burst, int):
+                raise TypeError("The argument 'burst' is requested to be "
+                                "int.")
+            if burst < 1:
+                raise ValueError("The argument 'burst' is requested to be 1 "
+                                 "or larger than 1.")
+
         # Immutable variables
         self.__daemon = operator.truth(daemon)
         self.__loop_count = loop_count
+        self.__work_stealing = operator.truth(work_stealing)
+        self.__max_queue_size = max_queue_size
+        self.__queue_policy = queue_policy
+        self.__block_timeout = block_timeout
+        self.__min_workers = min_workers
+        self.__max_workers = max_workers
+        self.__idle_timeout = idle_timeout
+        self.__retire_at = None
+        self.__hooks = hooks
+        self.__bucket = None if rate_limit is None else \
+            _ratelimit.TokenBucket(rate_limit, burst)
 
         # Lock
-        self.__lock = threading.Condition(threading.Lock())
+        lock = threading.Lock()
+        self.__lock = threading.Condition(lock)
+        self.__not_full = threading.Condition(lock)
 
         # Mutable variables
         self.__is_killed = False
         self.__worker_size = worker_size
-        self.__futures = collections.deque()
+        self.__futures = _queue.TaskQueue()
         self.__stop_signals = 0
+        self.__idle_workers = 0
+        self.__blocked_senders = 0
+        self.__rejected_tasks = 0
+        self.__starting_workers = 0
         self.__workers = {}
+        self.__local_queues = {}
+        self.__worker_stats = {}
+        self.__retired_stats = _stats.WorkerStats()
+        self.__submitted_tasks = 0
+        self.__canceled_tasks = 0
+        self.__recycled_workers = 0
+        self.__peak_queued_tasks = 0
+        self.__delayed = set()
+
+        # Futures refer the pool weakly not to make reference cycles.
+        ref = weakref.ref(self)
+
+        def canceler(future):
+            pool = ref()
+            if pool is not None:
+                pool.__on_canceled(future)
+
+        self.__canceler = canceler
 
         for i in xrange(worker_size):
             self.__create_worker()
 
     def __create_worker(self):
+        # This method must be called under the lock except for in __init__.
         t = threading.Thread(target=self.__run)
         t.daemon = self.__daemon
         t.start()
+        self.__starting_workers += 1
+
+    def __grow(self):
+        '''
+        Create workers for queued tasks if no worker is idle in elastic mode.
+        This method must be called under the lock.
+        '''
+
+        if self.__max_workers is None:
+            return
+
+        queued_tasks = len(self.__futures) - self.__stop_signals
+        while self.__worker_size < self.__max_workers and \
+                self.__idle_workers + self.__starting_workers < queued_tasks:
+            self.__create_worker()
+            self.__worker_size += 1
 
     def __run(self):
 
         # Add own thread object to self.__workers
         my_id = id(threading.current_thread())
+        local = collections.deque() if self.__work_stealing else None
+        stats = _stats.WorkerStats()
+        hooks = self.__hooks
+        bucket = self.__bucket
         with self.__lock:
+            self.__starting_workers -= 1
             self.__workers[my_id] = False
+            self.__worker_stats[my_id] = stats
+            if local is not None:
+                self.__local_queues[my_id] = local
+
+        if hooks is not None:
+            _hooks._invoke(hooks.on_worker_spawn)
 
         # Helper Function
         def worker_exit_at():
+            # Before kill method with block=True returns.
+            if hooks is not None:
+                _hooks._invoke(hooks.on_worker_exit)
+
             with self.__lock:
                 # Delete own thread object.
                 del(self.__workers[my_id])
+                del(self.__worker_stats[my_id])
+                self.__retired_stats.merge(stats)
+
+                if local is not None:
+                    del(self.__local_queues[my_id])
+                    self.__hand_over(local)
 
                 # Decrease worker_size when pool is being killed.
                 if self.__is_killed:
@@ -127,33 +361,201 @@ class Pool(object):
         try:
             loop_count = 0
             while loop_count < self.__loop_count:
+                has_token = False
                 try:
-                    # dequeu.popleft() is thread safe.
-                    future = self.__futures.popleft()
+                    if bucket is not None and not self.__stop_signal_first(
+                            local):
+                        delay = bucket.take()
+                        if delay:
+                            self.__wait_token(delay)
+                            continue
+                        has_token = True
+
+                    future = self.__pop(local)
 
                     if future is None:
+                        if has_token:
+                            bucket.refund()
                         # kill itself if the task is None (stop signal).
                         with self.__lock:
                             self.__stop_signals -= 1
                         return
 
+                    # Claim the task before on_start not to be canceled.
+                    task = future._claim()
+                    if task is None:
+                        # Canceled by Future.cancel while queued.
+                        if has_token:
+                            bucket.refund()
+                        continue
+
                     loop_count += 1
                     self.__workers[my_id] = True
-                    future._run()
+                    if hooks is not None:
+                        _hooks._invoke(hooks.on_start, future)
+
+                    started_at = time.time()
+                    is_error = future._run(task)
+                    del task
+                    stats.record(future._queued_at(), started_at, time.time(),
+                                 is_error)
+
+                    if hooks is not None:
+                        _hooks._invoke(hooks.on_finish, future)
                     self.__workers[my_id] = False
 
                 except IndexError:
-                    # If self.__futures is empty, wait until task comes.
+                    if has_token:
+                        bucket.refund()
+
+                    # If no task is left, wait until task comes.
                     with self.__lock:
-                        while not self.__futures:
-                            self.__lock.wait()
+                        self.__idle_workers += 1
+                        try:
+                            if not self.__wait_task():
+                                # Retire because of idle timeout.
+                                self.__worker_size -= 1
+                                return
+                        finally:
+                            self.__idle_workers -= 1
 
             # Recreate a worker before suiside when loop ends.
-            self.__create_worker()
+            with self.__lock:
+                # Tasks left in own queue must be queued before stop signals
+                # to be done by the new worker.
+                if local is not None:
+                    self.__hand_over(local)
+                self.__create_worker()
+                self.__recycled_workers += 1
 
         finally:
             worker_exit_at()
 
+    def __hand_over(self, local):
+        '''
+        Move tasks left in the local queue to the shared queue to be done by
+        the other workers. This method must be called under the lock.
+        '''
+
+        if local:
+            while True:
+                try:
+                    self.__futures.appendleft(local.pop())
+                except IndexError:
+                    break
+            self.__lock.notify_all()
+
+    def __wait_task(self):
+        '''
+        Wait until any task comes and return True. In elastic mode, return
+        False if the worker should retire for idle timeout.
+        This method must be called under the lock.
+        '''
+
+        if self.__idle_timeout is None:
+            while not self.__has_task():
+                self.__lock.wait()
+            return True
+
+        # Don't wait with timeout; a timed wait polls on Python 2 and delays
+        # the task sent meanwhile. The timer thread wakes up the idle workers
+        # at the earliest deadline instead.
+        deadline = time.time() + self.__idle_timeout
+        while not self.__has_task():
+            if self.__worker_size > self.__min_workers and \
+                    not self.__is_killed:
+                if deadline <= time.time():
+                    return False
+
+                if self.__retire_at is None or deadline < self.__retire_at:
+                    self.__retire_at = deadline
+                    _timer._schedule(deadline, self.__wake_idle, deadline)
+
+            self.__lock.wait()
+
+        return True
+
+    def __wake_idle(self, when):
+        '''
+        Wake up the idle workers to check the idle timeout. Called in the
+        timer thread.
+        '''
+
+        with self.__lock:
+            if self.__retire_at == when:
+                # The workers still idle schedule the next one.
+                self.__retire_at = None
+            self.__lock.notify_all()
+
+    def __stop_signal_first(self, local):
+        '''
+        Return True if the next to pop is a stop signal, which is done
+        without a token in rate limited mode.
+        '''
+
+        if local:
+            return False
+
+        try:
+            return self.__futures.peekleft() is None
+        except IndexError:
+            return False
+
+    def __wait_token(self, delay):
+        '''
+        Wait `delay' seconds for the rate limit, or until the workers are
+        notified. (e.g. kill or set_worker_size is called.)
+        '''
+
+        with self.__lock:
+            # Don't create workers in elastic mode for the waiting worker.
+            self.__idle_workers += 1
+            try:
+                self.__lock.wait(delay)
+            finally:
+                self.__idle_workers -= 1
+
+    def __pop(self, local):
+        '''
+        Return a task or a stop signal (None) to do next, or raise IndexError
+        if nothing is left.
+        '''
+
+        # deque.pop() and deque.popleft() are thread safe.
+        if local:
+            # Own queue is LIFO.
+            return local.pop()
+
+        try:
+            future = self.__futures.popleft()
+        except IndexError:
+            if local is None:
+                raise
+        else:
+            # Wake up a sender waiting for a room of the queue.
+            if self.__blocked_senders:
+                with self.__lock:
+                    self.__not_full.notify()
+            return future
+
+        # Steal the oldest task of another worker.
+        for q in self.__local_queues.values():
+            try:
+                return q.popleft()
+            except IndexError:
+                pass
+
+        raise IndexError("No task is left.")
+
+    def __has_task(self):
+        if self.__futures:
+            return True
+
+        if self.__work_stealing:
+            return any(self.__local_queues.itervalues())
+
+        return False
+
     def send(self, func, *args, **kwargs):
         """
         Queue specified callable with the arguments and returns a Future
@@ -196,17 +598,603 @@ class Pool(object):
             raise TypeError("The argument 2 'func' is requested to be "
                             "callable.")
 
+        if self.__work_stealing:
+            my_id = id(threading.current_thread())
+            local = self.__local_queues.get(my_id)
+            if local is not None:
+                return self.__send_local(local, self.__worker_stats[my_id],
+                                         func, *args, **kwargs)
+
+        future = _future.PoolFuture(func, *args, **kwargs)
+        self.__send_future(future, 'Pool.send', 0)
+        return future
+
+    def send_with_priority(self, priority, func, *args, **kwargs):
+        """
+        Same to send except that the task is queued with `priority'.
+
+        Argument `priority' is a number. Queued tasks with smaller priority
+        are done earlier, and tasks with the same priority are done in the
+        order they are queued. Tasks queued by send method have priority 0.
+
+          import thread_utils
+
+          with thread_utils.Pool(worker_size=3) as pool:
+              for i in xrange(100):
+                  pool.send(batch_job, i)
+
+              # Done before the batch jobs not started yet.
+              urgent = pool.send_with_priority(-1, interactive_job)
+
+        In work stealing mode, tasks sent by this method are queued to the
+        queue shared by all the workers even if sent from a worker.
+
+        This method raises DeadPoolError if called after kill method is called.
+        """
+
+        # Argument Check
+        self.__check_priority(priority)
+        if not callable(func):
+            raise TypeError("The argument 3 'func' is requested to be "
+                            "callable.")
+
+        future = _future.PoolFuture(func, *args, **kwargs)
+        self.__send_future(future, 'Pool.send_with_priority', priority)
+        return future
+
+    def send_after(self, delay, func, *args, **kwargs):
+        """
+        Same to send except that the task is queued after `delay' seconds.
+
+        No worker waits for the delay; a thread shared by all the pools
+        queues the task when it is due. The returned Future object can be
+        canceled by its cancel method before the task is started.
+
+          import thread_utils
+
+          def remind(msg):
+              print msg
+
+          with thread_utils.Pool() as pool:
+              pool.send_after(3, remind, "3 seconds passed.")
+              future = pool.send_after(5, remind, "Never displayed.")
+              future.cancel()
+              pool.send(remind, "Displayed first.")
+              time.sleep(6)
+
+        Delayed tasks are not limited by `max_queue_size', and are canceled
+        by cancel and kill method even if not due.
+
+        This method raises DeadPoolError if called after kill method is called.
+        """
+
+        # Argument Check
+        if isinstance(delay, bool) or \
+                not isinstance(delay, (int, long, float)):
+            raise TypeError("The argument 2 'delay' is requested to be a "
+                            "number.")
+        if not callable(func):
+            raise TypeError("The argument 3 'func' is requested to be "
+                            "callable.")
+
+        return self.__send_delayed(time.time() + delay, 'Pool.send_after',
+                                   func, *args, **kwargs)
+
+    def send_at(self, timestamp, func, *args, **kwargs):
+        """
+        Same to send_after except that the task is queued at `timestamp'
+        (seconds since the epoch as time.time() returns.)
+        """
+
+        # Argument Check
+        if isinstance(timestamp, bool) or \
+                not isinstance(timestamp, (int, long, float)):
+            raise TypeError("The argument 2 'timestamp' is requested to be a "
+                            "number.")
+        if not callable(func):
+            raise TypeError("The argument 3 'func' is requested to be "
+                            "callable.")
+
+        return self.__send_delayed(timestamp, 'Pool.send_at',
+                                   func, *args, **kwargs)
+
+    def send_dependent(self, futures, func, *args, **kwargs):
+        """
+        Same to send except that the task is queued after all the Future
+        objects in `futures' are finished, and their results are passed to
+        `func' before `args'.
+
+        No worker blocks to wait for `futures', so tasks depending on each
+        other don't occupy the workers nor cause dead lock.
+
+          import thread_utils
+
+          with thread_utils.Pool(worker_size=2) as pool:
+              a = pool.send(download, url_a)
+              b = pool.send(download, url_b)
+              c = pool.send_dependent([a, b], merge, output_path)
+              # merge(result of a, result of b, output_path) is called.
+
+        If any of `futures' raises an exception (including CancelError), the
+        task is not done and the returned Future object raises the same
+        exception. The returned Future object can be canceled by its cancel
+        method, and the task not queued yet is canceled by cancel and kill
+        method as the task sent by send_after.
+
+        This method raises DeadPoolError if called after kill method is called.
+        """
+
+        # Argument Check
+        futures = list(futures)
+        for f in futures:
+            if not isinstance(f, _future.Future):
+                raise TypeError("The argument 2 'futures' is requested to be "
+                                "a list of Future objects.")
+        if not callable(func):
+            raise TypeError("The argument 3 'func' is requested to be "
+                            "callable.")
+
+        future = _future.PoolFuture(_call_with_results, futures, func, args,
+                                    kwargs)
+        future._set_canceler(self.__canceler)
+
         with self.__lock:
             if self.__is_killed:
-                raise error.DeadPoolError("Pool.send is called after killed.")
-
-            # Wake up workers waiting task.
-            self.__lock.notify()
+                raise error.DeadPoolError("Pool.send_dependent is called "
+                                          "after killed.")
+            self.__delayed.add(future)
 
-            future = _future.PoolFuture(func, *args, **kwargs)
-            self.__futures.append(future)
+        if not futures:
+            self.__fire(future)
             return future
 
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def on_done(f):
+            try:
+                f.receive()
+            except BaseException as e:
+                self.__fail_delayed(future, e)
+                return
+
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+
+            self.__fire(future)
+
+        for f in futures:
+            f._add_callback(on_done)
+
+        return future
+
+    def __fail_delayed(self, future, e):
+        ''' Set exception `e' to the delayed task instead of doing it. '''
+
+        with self.__lock:
+            try:
+                self.__delayed.remove(future)
+            except KeyError:
+                # Canceled or failed already.
+                return
+
+        future._set_result(e, True)
+
+    def __send_delayed(self, when, method_name, func, *args, **kwargs):
+        future = _future.PoolFuture(func, *args, **kwargs)
+        future._set_canceler(self.__canceler)
+
+        with self.__lock:
+            if self.__is_killed:
+                raise error.DeadPoolError("%s is called after killed." %
+                                          method_name)
+            self.__delayed.add(future)
+
+        _timer._schedule(when, self.__fire, future)
+        return future
+
+    def __fire(self, future):
+        '''
+        Queue the delayed task when it is due. Called in the timer thread, or
+        the thread finishing the last dependency of send_dependent.
+        '''
+
+        with self.__lock:
+            try:
+                self.__delayed.remove(future)
+            except KeyError:
+                # Canceled by cancel or kill method, or Future.cancel.
+                return
+
+        # Canceled by Future.cancel meanwhile. (It has been counted.)
+        if future.is_finished():
+            return
+
+        future._touch()
+        if self.__hooks is not None:
+            _hooks._invoke(self.__hooks.on_submit, future)
+
+        with self.__lock:
+            if not self.__is_killed:
+                self.__lock.notify()
+                self.__futures.append(future)
+                self.__submitted_tasks += 1
+                self.__update_peak()
+                self.__grow()
+                return
+
+        # Killed meanwhile.
+        self.__cancel_futures([future])
+
+    @staticmethod
+    def __check_priority(priority):
+        if isinstance(priority, bool) or \
+                not isinstance(priority, (int, long, float)):
+            raise TypeError("The argument 'priority' is requested to be "
+                            "a number.")
+
+    def __send_future(self, future, method_name, priority):
+        if self.__max_queue_size:
+            self.__send_futures([future], method_name, priority)
+            return
+
+        future._set_canceler(self.__canceler)
+        if self.__hooks is not None:
+            _hooks._invoke(self.__hooks.on_submit, future)
+
+        with self.__lock:
+            if not self.__is_killed:
+                # Wake up workers waiting task.
+                self.__lock.notify()
+                self.__futures.append(future, priority)
+                self.__submitted_tasks += 1
+                self.__update_peak()
+                self.__grow()
+                return
+
+        self.__reject([future])
+        raise error.DeadPoolError("%s is called after killed." % method_name)
+
+    def __send_local(self, local, stats, func, *args, **kwargs):
+        # Called from a worker of this pool in work stealing mode.
+        # Own queue and stats are accessed without lock. (Expect for GIL.)
+        if self.__is_killed:
+            raise error.DeadPoolError("Pool.send is called after killed.")
+
+        future = _future.PoolFuture(func, *args, **kwargs)
+        future._set_canceler(self.__canceler)
+        if self.__hooks is not None:
+            _hooks._invoke(self.__hooks.on_submit, future)
+        local.append(future)
+        stats.submitted += 1
+
+        # Wake up a worker waiting task to steal it.
+        if self.__idle_workers:
+            with self.__lock:
+                self.__lock.notify()
+
+        return future
+
+    def send_many(self, func, args_list, priority=0):
+        """
+        Queue specified callable once for each element of `args_list' and
+        return a list of Future objects.
+
+        Each element of `args_list' is a tuple of positional arguments passed
+        to `func'. All the tasks are queued at once, so this method is much
+        faster than calling `send' many times. All the tasks are queued with
+        `priority'. See help(Pool.send_with_priority) for the priority.
+
+          import thread_utils
+
+          with thread_utils.Pool(worker_size=3) as pool:
+              futures = pool.send_many(pow, [(2, i) for i in xrange(10)])
+
+          print [f.receive() for f in futures]
+
+        This method raises DeadPoolError if called after kill method is called.
+
+        If the batch is larger than the room of the queue in 'block' policy,
+        the tasks are queued little by little. If QueueFullError or
+        DeadPoolError is raised meanwhile, attribute `queued' of the error is
+        the list of the Future objects already queued, which is a prefix of
+        the batch. The tasks are done as usual.
+        """
+
+        # Argument Check
+        if not callable(func):
+            raise TypeError("The argument 2 'func' is requested to be "
+                            "callable.")
+        self.__check_priority(priority)
+
+        futures = [_future.PoolFuture(func, *args) for args in args_list]
+        self.__send_futures(futures, 'Pool.send_many', priority)
+        return futures
+
+    def send_batch(self, tasks, priority=0):
+        """
+        Queue many callables at once and return a list of Future objects.
+
+        Each element of `tasks' is a tuple (func, args) or (func, args,
+        kwargs), where `args' is a tuple and `kwargs' is a dict of arguments
+        passed to `func'. See help(Pool.send_many) for more detail, including
+        the error raised after a part of the tasks is queued.
+
+        This method raises DeadPoolError if called after kill method is called.
+        """
+
+        # Argument Check
+        self.__check_priority(priority)
+
+        futures = []
+        for task in tasks:
+            func = task[0]
+            # Argument Check
+            if not callable(func):
+                raise TypeError("The first element of each task is requested "
+                                "to be callable.")
+
+            kwargs = task[2] if len(task) > 2 else {}
+            futures.append(_future.PoolFuture(func, *task[1], **kwargs))
+
+        self.__send_futures(futures, 'Pool.send_batch', priority)
+        return futures
+
+    def __send_futures(self, futures, method_name, priority):
+        to_run = dropped = ()
+
+        canceler = self.__canceler
+        for f in futures:
+            f._set_canceler(canceler)
+
+        hooks = self.__hooks
+        if hooks is not None:
+            for f in futures:
+                _hooks._invoke(hooks.on_submit, f)
+
+        sent = futures
+        try:
+            with self.__lock:
+                if self.__is_killed:
+                    raise error.DeadPoolError("%s is called after killed." %
+                                              method_name)
+
+                if self.__max_queue_size:
+                    futures, to_run, dropped = self.__make_room(
+                        futures, method_name, priority)
+
+                # Wake up as many workers waiting task as the tasks.
+                self.__lock.notify(len(futures))
+                self.__futures.extend(futures, priority)
+                self.__submitted_tasks += len(futures)
+                self.__update_peak()
+                self.__grow()
+
+        except (error.DeadPoolError, error.QueueFullError) as e:
+            self.__reject(sent[len(e.queued):])
+            raise
+
+        self.__cancel_futures(dropped)
+
+        # 'caller_runs' policy
+        for f in to_run:
+            task = f._claim()
+            if task is None:
+                # Canceled by Future.cancel. (Another thread can do it.)
+                continue
+            if hooks is not None:
+                _hooks._invoke(hooks.on_start, f)
+            f._run(task)
+            if hooks is not None:
+                _hooks._invoke(hooks.on_finish, f)
+
+    def __reject(self, futures):
+        '''
+        Notify the hooks that `futures' notified of on_submit are not queued.
+        This method must be called without the lock.
+        '''
+
+        for f in futures:
+            # Not a task of this pool any more.
+            f._set_canceler(None)
+            if self.__hooks is not None:
+                _hooks._invoke(self.__hooks.on_cancel, f)
+
+    def __update_peak(self):
+        # This method must be called under the lock.
+        queued_tasks = len(self.__futures) - self.__stop_signals
+        if self.__peak_queued_tasks < queued_tasks:
+            self.__peak_queued_tasks = queued_tasks
+
+    def __make_room(self, futures, method_name, priority):
+        '''
+        Make room of self.__futures for `futures' according to queue_policy.
+        This method must be called under the lock.
+
+        Return tuple (futures to queue, futures to do in the caller thread,
+        futures to cancel).
+        '''
+
+        # Count this sender before checking the room. A worker dequeues a
+        # task without the lock and notifies only the counted senders, so the
+        # wakeup would be lost if the task were dequeued just after the check.
+        self.__blocked_senders += 1
+        try:
+            room = self.__max_queue_size - len(self.__futures) + \
+                self.__stop_signals
+            if len(futures) <= room:
+                return (futures, (), ())
+
+            room = max(room, 0)
+            policy = self.__queue_policy
+
+            if policy == 'reject':
+                self.__rejected_tasks += len(futures)
+                raise error.QueueFullError("The queue of the pool is full.")
+
+            if policy == 'caller_runs':
+                self.__rejected_tasks += len(futures) - room
+                return (futures[:room], futures[room:], ())
+
+            if policy == 'drop_oldest':
+                dropped = []
+                while room < len(futures):
+                    try:
+                        dropped.append(self.__futures.popleft_task())
+                        room += 1
+                    except IndexError:
+                        # More tasks than max_queue_size are sent at once.
+                        dropped.extend(futures[:len(futures) - room])
+                        futures = futures[len(futures) - room:]
+
+                self.__rejected_tasks += len(dropped)
+                return (futures, (), dropped)
+
+            # 'block' policy. Queue tasks little by little as room is made.
+            if self.__block_timeout is not None:
+                deadline = time.time() + self.__block_timeout
+
+            queued = []
+            while room < len(futures):
+                if room > 0:
+                    self.__lock.notify(room)
+                    self.__futures.extend(futures[:room], priority)
+                    queued.extend(futures[:room])
+                    self.__submitted_tasks += room
+                    self.__update_peak()
+                    futures = futures[room:]
+                    self.__grow()
+
+                if self.__block_timeout is None:
+                    self.__not_full.wait()
+                else:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        self.__rejected_tasks += len(futures)
+                        e = error.QueueFullError("The queue of the pool is "
+                                                 "full.")
+                        e.queued = queued
+                        raise e
+                    self.__not_full.wait(timeout)
+
+                if self.__is_killed:
+                    e = error.DeadPoolError("%s is called after killed." %
+                                            method_name)
+                    e.queued = queued
+                    raise e
+
+                room = self.__max_queue_size - len(self.__futures) + \
+                    self.__stop_signals
+
+            return (futures, (), ())
+
+        finally:
+            self.__blocked_senders -= 1
+
+    def imap(self, func, iterable, window=None):
+        """
+        Invoke `func' with each element of `iterable' in workers and return
+        an iterator which yields the results in order of `iterable'.
+
+        `iterable' is consumed lazily. At most `window' tasks are sent to the
+        pool at a time, and the next element is sent only after the oldest
+        result is yielded. Results finished earlier than the oldest one are
+        kept until their turn comes. The default value of `window' is twice as
+        large as the worker size. (`max_workers' in elastic mode.)
+
+        If a task raises an exception, the iterator raises it when the turn
+        comes and stops. (The tasks already sent are left running.)
+
+          import thread_utils
+
+          with thread_utils.Pool(worker_size=3) as pool:
+              for n in pool.imap(abs, xrange(-1000000, 0)):
+                  print n
+
+        This method raises DeadPoolError if called after kill method is called.
+        If kill method is called during the iteration, the iterator raises
+        DeadPoolError when it sends the next task.
+        """
+
+        window = self.__check_window(func, window, 'Pool.imap')
+        return self.__imap(func, iterable, window)
+
+    def imap_unordered(self, func, iterable, window=None):
+        """
+        Same to imap except that results are yielded in order of completion.
+
+        A slow task does not block results of the others. See help(Pool.imap)
+        for the details of the arguments.
+        """
+
+        window = self.__check_window(func, window, 'Pool.imap_unordered')
+        return self.__imap_unordered(func, iterable, window)
+
+    def map(self, func, iterable, window=None):
+        """
+        Same to imap except that this method blocks until all tasks are done
+        and returns the results as a list.
+        """
+
+        return list(self.imap(func, iterable, window))
+
+    def __check_window(self, func, window, method_name):
+        # Argument Check
+        if not callable(func):
+            raise TypeError("The argument 2 'func' is requested to be "
+                            "callable.")
+
+        # The iterator sends the tasks lazily; check it here not to raise
+        # the error only when the iteration starts.
+        if self.__is_killed:
+            raise error.DeadPoolError("%s is called after killed." %
+                                      method_name)
+
+        if window is None:
+            # The worker size of elastic pool grows up to max_workers.
+            if self.__max_workers is not None:
+                return 2 * self.__max_workers
+            return max(1, 2 * self.__worker_size)
+
+        if not isinstance(window, int):
+            raise TypeError("The argument 4 'window' is requested "
+                            "to be int.")
+        if window < 1:
+            raise ValueError("The argument 4 'window' is requested to be 1"
+                             " or larger than 1.")
+        return window
+
+    def __imap(self, func, iterable, window):
+        futures = collections.deque()
+
+        for arg in iterable:
+            if len(futures) == window:
+                yield futures.popleft().receive()
+            futures.append(self.send(func, arg))
+
+        while futures:
+            yield futures.popleft().receive()
+
+    def __imap_unordered(self, func, iterable, window):
+        # Futures are put into this queue when finished.
+        finished = Queue.Queue()
+        running = 0
+
+        for arg in iterable:
+            if running == window:
+                future = finished.get()
+                running -= 1
+                yield future.receive()
+            self.send(func, arg)._add_callback(finished.put)
+            running += 1
+
+        while running:
+            future = finished.get()
+            running -= 1
+            yield future.receive()
+
     def kill(self, force=False, block=False):
         """
         Set internal flag and make workers stop.
@@ -216,7 +1204,8 @@ class Pool(object):
         tasks not started before this method is called will be left undone.
         If a Future instance is related to canceled task and the receive
         method is called, it will raise CancelError. The default value is
-        False.
+        False. Tasks sent by send_after or send_at and not due yet are
+        canceled regardless of the argument force.
 
         If the argument block is True, block until the all workers done the
         tasks. Otherwise, it returns immediately. The default value is False.
@@ -241,16 +1230,23 @@ class Pool(object):
         with self.__lock:
             self.__is_killed = True
 
-            if force:
-                self.cancel()
+            canceled = self.__drain() if force else []
+            canceled.extend(self.__delayed)
+            self.__delayed.clear()
 
+            # Stop signals are done after all tasks.
             for i in xrange(self.__worker_size):
-                self.__futures.append(None)
+                self.__futures.append_last(None)
             self.__stop_signals += self.__worker_size
             # Wake up workers waitin task or stop signal.
             self.__lock.notify_all()
+            # Wake up senders waiting for the queue not to be full.
+            self.__not_full.notify_all()
 
-            if block:
+        self.__cancel_futures(canceled)
+
+        if block:
+            with self.__lock:
                 while self.__worker_size > 0:
                     self.__lock.wait()
 
@@ -261,13 +1257,100 @@ class Pool(object):
         The return value is a tuple of 3 ints. The format is as follows.
         (worker size, tasks currently being done, queued undone tasks)
 
+        The returned tuple has attribute `rejected_tasks' in addition; it is
+        how many tasks were rejected, canceled or done in the sender thread
+        because the queue was full. See help(Pool.__init__) for the details.
+
         The values are only indication.
         Even the instance itself doesn't know the accurate values.
         '''
 
         tasks_being_done = sum(self.__workers.itervalues())
         queued_tasks = len(self.__futures) - self.__stop_signals
-        return (self.__worker_size, tasks_being_done, queued_tasks,)
+        for q in self.__local_queues.values():
+            queued_tasks += len(q)
+        return Inspection(self.__worker_size, tasks_being_done, queued_tasks,
+                          self.__rejected_tasks)
+
+    def stats(self):
+        '''
+        Return dict of the statistics of the instance.
+
+        The keys are as follows. Counters are cumulative since the instance
+        was created.
+
+          'worker_size': Same to the 1st element of the inspect method.
+          'tasks_being_done': Same to the 2nd element of the inspect method.
+          'queued_tasks': Same to the 3rd element of the inspect method.
+          'peak_queued_tasks': Max number of the tasks queued at a time.
+                               (Local queues in work stealing mode are not
+                               included.)
+          'submitted': How many tasks were queued.
+          'completed': How many tasks were finished without an exception.
+          'failed': How many tasks raised an exception.
+          'canceled': How many tasks were canceled.
+          'rejected': Same to attribute `rejected_tasks' of the inspect method.
+          'recycled_workers': How many workers were recreated after doing
+                              `loop_count' tasks.
+          'queue_wait': Histogram of seconds from when a task is sent until it
+                        is started.
+          'run_time': Histogram of seconds to do a task.
+          'workers': List of dict for each worker alive. The keys are
+                     'completed', 'failed', 'busy' (seconds to do the tasks),
+                     'alive' (seconds since created) and 'utilization' (busy
+                     / alive.)
+
+        Each histogram is a dict with keys 'count', 'sum' (seconds) and
+        'buckets'. 'buckets' is a list of tuple (upper bound seconds, count) of
+        non-empty buckets; bucket boundaries are powers of 2 microseconds. The
+        upper bound of the last bucket is None (unlimited.)
+
+        Tasks done in the sender thread by 'caller_runs' policy are counted
+        only as 'rejected'. Tasks being done are not counted in 'completed',
+        'failed', 'busy' nor the histograms until they are finished.
+
+        Workers update their own statistics without the lock, so the values
+        are only indication like the inspect method.
+        '''
+
+        with self.__lock:
+            total = _stats.WorkerStats()
+            total.merge(self.__retired_stats)
+            worker_stats = self.__worker_stats.values()
+            for ws in worker_stats:
+                total.merge(ws)
+
+            ret = {
+                'peak_queued_tasks': self.__peak_queued_tasks,
+                'submitted': self.__submitted_tasks + total.submitted,
+                'completed': total.completed,
+                'failed': total.failed,
+                'canceled': self.__canceled_tasks,
+                'recycled_workers': self.__recycled_workers,
+                'queue_wait': total.queue_wait.snapshot(),
+                'run_time': total.run_time.snapshot(),
+            }
+
+        inspection = self.inspect()
+        ret['worker_size'] = inspection[0]
+        ret['tasks_being_done'] = inspection[1]
+        ret['queued_tasks'] = inspection[2]
+        ret['rejected'] = inspection.rejected_tasks
+
+        now = time.time()
+        workers = []
+        for ws in worker_stats:
+            alive = now - ws.started_at
+            workers.append({
+                'completed': ws.completed,
+                'failed': ws.failed,
+                'busy': ws.busy,
+                'alive': alive,
+                'utilization': ws.busy / alive if alive > 0 else 0.0,
+            })
+        ret['workers'] = workers
+
+        return ret
 
     def cancel(self):
         '''
@@ -282,26 +1365,65 @@ class Pool(object):
 
         If a future is related to canceled task and the receive method is
         called, it will raise CancelError.
+
+        Tasks sent by send_after or send_at and not due yet are canceled,
+        too.
         '''
 
-        # Store how many stop signals to fetch to append again.
-        stop_signals = 0
-        try:
-            # Pop all futures.
+        with self.__lock:
+            canceled = self.__drain()
+            canceled.extend(self.__delayed)
+            self.__delayed.clear()
+            self.__not_full.notify_all()
+
+        self.__cancel_futures(canceled)
+
+    def __drain(self):
+        '''
+        Dequeue all undone tasks and return them. Stop signals are left.
+        This method must be called under the lock.
+        '''
+
+        futures = self.__futures.drain()
+
+        # Local queues of workers have no stop signal.
+        for q in self.__local_queues.values():
             while True:
-                # dequeue.pop() is thread safe.
-                f = self.__futures.pop()
+                try:
+                    # dequeue.pop() is thread safe.
+                    futures.append(q.pop())
+                except IndexError:
+                    break
 
-                if f is None:
-                    stop_signals += 1
+        return futures
 
-                else:
-                    f._set_result(error.CancelError("This task was canceled "
-                                                    "before done."), True)
-        except IndexError:
-            # Append as many stop signals as poped.
-            for i in xrange(stop_signals):
-                self.__futures.appendleft(None)
+    def __cancel_futures(self, futures):
+        # This method must be called without the lock.
+        canceled = 0
+        for f in futures:
+            if f._set_result(error.CancelError("This task was canceled "
+                                               "before done."), True):
+                canceled += 1
+                if self.__hooks is not None:
+                    _hooks._invoke(self.__hooks.on_cancel, f)
+
+        if canceled:
+            with self.__lock:
+                self.__canceled_tasks += canceled
+
+    def __on_canceled(self, future):
+        '''
+        Count the task canceled by Future.cancel and notify the hooks.
+        This method must be called without the lock.
+        '''
+
+        with self.__lock:
+            self.__canceled_tasks += 1
+            # Release the delayed task not to be queued.
+            self.__delayed.discard(future)
+
+        if self.__hooks is not None:
+            _hooks._invoke(self.__hooks.on_cancel, future)
 
     def set_worker_size(self, worker_size):
         '''
@@ -311,6 +1433,8 @@ class Pool(object):
         created soon when increasing,howeve, It could take some time when
         decreasing because workers can't stop while doing a task.
 
+        In elastic mode, the worker size changes later according to the load.
+
         This method raises DeadPoolError if called after kill method is called.
         '''
 
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import cPickle as pickle
+import multiprocessing
+import sys
+import threading
+import weakref
+
+import error
+import pool
+
+
+class ProcessPool(object):
+    """
+    Pool worker processes and do tasks parallel using them.
+
+    The interface is same to thread_utils.Pool. Tasks sent to this object are
+    done in child processes, so CPU bound tasks are done parallel beyond GIL.
+    The callable, the arguments and what the callable returns or raises are
+    passed between processes by pickle, so they must be picklable.
+
+    Each worker process is owned by a worker thread in the parent process.
+    The worker thread sends task to its process and waits for the result.
+
+    All public methods are thread safe.
+    """
+
+    __slots__ = (
+        '__pool',  # thread_utils.Pool of the threads owning processes.
+        '__loop_count',  # How many tasks each process does before regenerate.
+        '__local',  # threading.local to store the process of each thread.
+        '__processes',  # WeakSet of all living _Process instances.
+    )
+
+    def __init__(self, worker_size=1, loop_count=sys.maxint, daemon=True):
+        """
+        All arguments are optional.
+
+        Argument `worker_size' specifies the number of the worker process.
+        Each process will invoke callable `loop_count' times. After that, the
+        process exits and a new process is created.
+
+        If argument `daemon' is True, the worker threads owning the processes
+        will be daemonic, or not. Worker processes are always daemonic, i.e.
+        they are terminated when the parent process exits.
+        """
+
+        # Argument Check
+        if not isinstance(loop_count, int):
+            raise TypeError("The argument 3 'loop_count' is requested "
+                            "to be int.")
+        if loop_count < 1:
+            raise ValueError("The argument 3 'loop_count' is requested to be 1"
+                             " or larger than 1.")
+
+        self.__pool = pool.Pool(worker_size, daemon=daemon)
+        self.__loop_count = loop_count
+        self.__local = threading.local()
+        self.__processes = weakref.WeakSet()
+
+    def __call(self, func, args, kwargs):
+        # Called in the worker threads.
+        process = getattr(self.__local, 'process', None)
+        if process is None:
+            process = _Process()
+            self.__local.process = process
+            self.__processes.add(process)
+
+        try:
+            is_error, result = process.call(func, args, kwargs)
+        except EOFError:
+            self.__local.process = None
+            process.close()
+            raise error.Error("The worker process exited unexpectedly.")
+
+        # Regenerate the process when loop ends.
+        if process.count >= self.__loop_count:
+            self.__local.process = None
+            process.close()
+
+        if is_error:
+            raise result
+        return result
+
+    def send(self, func, *args, **kwargs):
+        """
+        Queue specified callable with the arguments and returns a Future
+        object.
+
+        Argument `func' is a callable object invoked by worker processes, and
+        *args and **kwargs are arguments passed to it. They must be picklable.
+
+        See help(thread_utils.Pool.send) for more detail.
+        """
+
+        # Argument Check
+        if not callable(func):
+            raise TypeError("The argument 2 'func' is requested to be "
+                            "callable.")
+
+        return self.__pool.send(self.__call, func, args, kwargs)
+
+    def kill(self, force=False, block=False):
+        """
+        Set internal flag and make workers stop.
+
+        See help(thread_utils.Pool.kill) for the arguments. If argument block
+        is True, this method also waits for all worker processes to exit.
+        """
+
+        self.__pool.kill(force, block)
+
+        if block:
+            for process in list(self.__processes):
+                process.close()
+
+    def inspect(self):
+        '''
+        Return tuple which indicate the instance status.
+
+        See help(thread_utils.Pool.inspect) for more detail.
+        '''
+
+        return self.__pool.inspect()
+
+    def cancel(self):
+        '''
+        Cancel all tasks in the Queue.
+
+        See help(thread_utils.Pool.cancel) for more detail.
+        '''
+
+        self.__pool.cancel()
+
+    def set_worker_size(self, worker_size):
+        '''
+        Change worker size.
+
+        See help(thread_utils.Pool.set_worker_size) for more detail.
+        '''
+
+        self.__pool.set_worker_size(worker_size)
+
+    def __del__(self):
+        self.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, value, traceback):
+        self.kill()
+
+
+class _Process(object):
+    """
+    Child process doing tasks and the pipe connected to it.
+
+    The process exits when this object is closed or collected. (Other child
+    processes could inherit the pipe, so the child process can't notice the
+    parent closing it.)
+    """
+
+    __slots__ = ('__process', '__conn', '__is_closed', 'count',
+                 '__weakref__',)
+
+    def __init__(self):
+        self.__is_closed = True
+        self.__conn, child_conn = multiprocessing.Pipe()
+        self.__process = multiprocessing.Process(
+            target=_run_child, args=(child_conn, self.__conn))
+        self.__process.daemon = True
+        self.__process.start()
+        child_conn.close()
+        self.__is_closed = False
+
+        # How many tasks are done.
+        self.count = 0
+
+        # Join processes exited before.
+        multiprocessing.active_children()
+
+    def call(self, func, args, kwargs):
+        '''
+        Invoke func in the child process and return tuple (is_error, result).
+
+        Raise EOFError if the child process exited.
+        '''
+
+        self.count += 1
+        # Pickle the task beforehand not to confuse the error of the task
+        # with that of the pipe.
+        try:
+            task = pickle.dumps((func, args, kwargs), pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            return (True, e)
+
+        try:
+            self.__conn.send_bytes(task)
+            return self.__conn.recv()
+        except (IOError, OSError):
+            # Broken pipe. (The child process was killed while idle.)
+            raise EOFError
+
+    def close(self):
+        # Expect for GIL.
+        if self.__is_closed:
+            return
+        self.__is_closed = True
+
+        try:
+            # Stop signal
+            self.__conn.send(None)
+        except (EOFError, IOError):
+            pass
+
+        self.__conn.close()
+        self.__process.join()
+
+    def __del__(self):
+        self.close()
+
+
+def _run_child(conn, parent_conn):
+    # Main routine of the child processes.
+    parent_conn.close()
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, IOError):
+            return
+
+        # Stop signal
+        if task is None:
+            return
+
+        func, args, kwargs = task
+
+        try:
+            result = (False, func(*args, **kwargs))
+        except BaseException as e:
+            result = (True, e)
+
+        try:
+            conn.send(result)
+        except (EOFError, IOError):
+            return
+        except Exception as e:
+            # Failed to pickle the result.
+            conn.send((True, error.Error("Failed to send the result: %r" %
+                                         (e,))))
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import thread
+import threading
+
+
+class RWLock(object):
+    """
+    Reader-writer lock.
+
+    Any number of threads can hold the lock for reading at the same time,
+    while only one thread can hold it for writing and no thread can hold it
+    for reading then.
+
+    If argument `writer_preference' is True, threads trying to read are
+    blocked while any thread is waiting to write, so that writers never
+    starve. Otherwise, threads can read unless a thread is writing, so that
+    writers could wait forever while readers come one after another.
+
+    If argument `reentrant' is True, the thread holding the lock can acquire
+    it again; the thread reading can read again even if a writer is waiting,
+    and the thread writing can read or write again. The lock must be released
+    as many times as acquired. Upgrading from reading to writing is not
+    allowed because it can deadlock. If `reentrant' is False, acquiring the
+    lock for writing again by the thread writing raises RuntimeError instead
+    of deadlock.
+
+    Attributes `reader' and `writer' are context managers to acquire and to
+    release the lock for reading and for writing.
+
+      import thread_utils
+
+      lock = thread_utils.RWLock()
+      cache = {}
+
+      def get(key):
+          with lock.reader:
+              return cache.get(key)
+
+      def put(key, value):
+          with lock.writer:
+              cache[key] = value
+
+    See also thread_utils.read_synchronized and
+    thread_utils.write_synchronized.
+    """
+
+    __slots__ = ('__lock', '__readers', '__writer', '__writes',
+                 '__waiting_writers', '__writer_preference', '__local',
+                 'reader', 'writer',)
+
+    def __init__(self, writer_preference=True, reentrant=False):
+        self.__lock = threading.Condition(threading.Lock())
+        self.__readers = 0  # How many times the lock is held for reading.
+        self.__writer = None  # Thread id writing.
+        self.__writes = 0  # How many times the writer holds the lock.
+        self.__waiting_writers = 0
+        self.__writer_preference = bool(writer_preference)
+        # Attribute 'reads' is how many times the thread holds for reading.
+        self.__local = threading.local() if reentrant else None
+
+        self.reader = _Guard(self.acquire_read, self.release_read)
+        self.writer = _Guard(self.acquire_write, self.release_write)
+
+    def __my_reads(self):
+        return getattr(self.__local, 'reads', 0)
+
+    def acquire_read(self):
+        """
+        Block until the lock can be held for reading, and hold it.
+        """
+
+        me = thread.get_ident()
+        with self.__lock:
+            reentering = self.__local is not None and \
+                (self.__writer == me or self.__my_reads() > 0)
+
+            if not reentering:
+                while self.__writer is not None or \
+                        (self.__writer_preference and self.__waiting_writers):
+                    self.__lock.wait()
+
+            self.__readers += 1
+            if self.__local is not None:
+                self.__local.reads = self.__my_reads() + 1
+
+    def release_read(self):
+        """
+        Release the lock held for reading. Raise RuntimeError if the lock is
+        not held for reading.
+        """
+
+        with self.__lock:
+            if self.__readers == 0 or \
+                    (self.__local is not None and self.__my_reads() == 0):
+                raise RuntimeError("The lock is not held for reading.")
+
+            self.__readers -= 1
+            if self.__local is not None:
+                self.__local.reads -= 1
+
+            if self.__readers == 0:
+                self.__lock.notify_all()
+
+    def acquire_write(self):
+        """
+        Block until the lock can be held for writing, and hold it.
+        """
+
+        me = thread.get_ident()
+        with self.__lock:
+            if self.__writer == me:
+                if self.__local is None:
+                    raise RuntimeError("The lock is already held for writing "
+                                       "by the current thread.")
+                self.__writes += 1
+                return
+
+            if self.__local is not None and self.__my_reads() > 0:
+                raise RuntimeError("The lock held for reading can't be "
+                                   "upgraded for writing.")
+
+            self.__waiting_writers += 1
+            try:
+                while self.__writer is not None or self.__readers > 0:
+                    self.__lock.wait()
+            finally:
+                self.__waiting_writers -= 1
+
+            self.__writer = me
+            self.__writes = 1
+
+    def release_write(self):
+        """
+        Release the lock held for writing. Raise RuntimeError if the current
+        thread doesn't hold the lock for writing.
+        """
+
+        with self.__lock:
+            if self.__writer != thread.get_ident():
+                raise RuntimeError("The lock is not held for writing by the "
+                                   "current thread.")
+
+            self.__writes -= 1
+            if self.__writes == 0:
+                self.__writer = None
+                self.__lock.notify_all()
+
+
+class _Guard(object):
+    '''
+    Context manager calling `acquire' on enter and `release' on exit.
+    '''
+
+    __slots__ = ('__acquire', '__release',)
+
+    def __init__(self, acquire, release):
+        self.__acquire = acquire
+        self.__release = release
+
+    def __enter__(self):
+        self.__acquire()
+
+    def __exit__(self, error_type, value, traceback):
+        self.__release()
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import threading
+import time
+import traceback
+
+import _stats
+import error
+import pool as _pool
+
+
+_MODES = ('fixed_rate', 'fixed_delay')
+_OVERLAPS = ('skip', 'coalesce')
+
+
+class Scheduler(object):
+    """
+    Run callables periodically by thread_utils.Pool.
+
+    No thread is dedicated to each job; each run is sent to the pool by
+    Pool.send_at, and the timer thread shared by all the pools queues it when
+    it is due.
+
+      import thread_utils
+
+      pool = thread_utils.Pool(worker_size=2)
+      scheduler = thread_utils.Scheduler(pool)
+
+      # Flush the metrics every 10 seconds, and refresh the cache 60 seconds
+      # after the last refresh finished.
+      flush = scheduler.schedule(10, metrics.flush)
+      refresh = scheduler.schedule(60, cache.refresh, mode='fixed_delay')
+
+      ...
+
+      scheduler.cancel()
+      pool.kill()
+
+    All public methods are thread safe.
+    """
+
+    __slots__ = ('__pool', '__jobs', '__lock',)
+
+    def __init__(self, pool):
+        """
+        Argument `pool' is an instance of thread_utils.Pool to run the jobs.
+        Pool.cancel and Pool.kill cancel the jobs, too.
+        """
+
+        # Argument Check
+        if not isinstance(pool, _pool.Pool):
+            raise TypeError("The argument 2 'pool' is requested to be an "
+                            "instance of thread_utils.Pool.")
+
+        self.__pool = pool
+        self.__jobs = set()
+        self.__lock = threading.Lock()
+
+    def schedule(self, interval, func, args=(), kwargs=None,
+                 mode='fixed_rate', overlap='skip', delay=None):
+        """
+        Run func(*args, **kwargs) every `interval' seconds and return a Job
+        object.
+
+        Argument `mode' is one of the followings.
+
+          'fixed_rate': Each run is due `interval' seconds after the previous
+                        due time, regardless of how long the runs take.
+          'fixed_delay': Each run is due `interval' seconds after the previous
+                         run finished. Runs never overlap.
+
+        Argument `overlap' specifies what to do in 'fixed_rate' mode when a
+        run is due while the previous run is running, or when the runs are
+        late for more than `interval' because the pool is busy.
+
+          'skip': Don't run it.
+          'coalesce': Run once as soon as the previous run finishes however
+                      many runs are due meanwhile.
+
+        The first run is due after `delay' seconds. (`interval' by default.)
+
+        Exception raised by `func' is printed to stderr and ignored.
+
+        This method raises DeadPoolError if the pool has been killed.
+        """
+
+        # Argument Check
+        if isinstance(interval, bool) or \
+                not isinstance(interval, (int, long, float)):
+            raise TypeError("The argument 2 'interval' is requested to be a "
+                            "number.")
+        if not interval > 0:
+            raise ValueError("The argument 2 'interval' is requested to be "
+                             "larger than 0.")
+
+        if not callable(func):
+            raise TypeError("The argument 3 'func' is requested to be "
+                            "callable.")
+
+        if mode not in _MODES:
+            raise ValueError("The argument 6 'mode' is requested to be one "
+                             "of %s." % (_MODES,))
+
+        if overlap not in _OVERLAPS:
+            raise ValueError("The argument 7 'overlap' is requested to be "
+                             "one of %s." % (_OVERLAPS,))
+
+        if delay is None:
+            delay = interval
+
+        job = Job(self.__pool, interval, func, tuple(args), kwargs or {},
+                  mode, overlap, self.__discard)
+        with self.__lock:
+            self.__jobs.add(job)
+
+        try:
+            job._start(time.time() + delay)
+        except error.DeadPoolError:
+            self.__discard(job)
+            raise
+
+        return job
+
+    def jobs(self):
+        ''' Return a list of the Job objects not canceled. '''
+
+        with self.__lock:
+            return list(self.__jobs)
+
+    def cancel(self):
+        '''
+        Cancel all the jobs. Runs being done are left unchanged.
+        '''
+
+        for job in self.jobs():
+            job.cancel()
+
+    def __discard(self, job):
+        with self.__lock:
+            self.__jobs.discard(job)
+
+
+class Job(object):
+    """
+    Job created by Scheduler.schedule.
+    """
+
+    __slots__ = ('__pool', '__interval', '__func', '__args', '__kwargs',
+                 '__mode', '__overlap', '__on_cancel', '__lock',
+                 '__is_canceled', '__is_running', '__pending', '__next',
+                 '__runs', '__failed', '__skipped', '__coalesced',
+                 '__lateness', '__max_lateness',)
+
+    def __init__(self, pool, interval, func, args, kwargs, mode, overlap,
+                 on_cancel):
+        self.__pool = pool
+        self.__interval = interval
+        self.__func = func
+        self.__args = args
+        self.__kwargs = kwargs
+        self.__mode = mode
+        self.__overlap = overlap
+        self.__on_cancel = on_cancel
+        # Reentrant for the callback of the run canceled in __send_at.
+        self.__lock = threading.RLock()
+
+        self.__is_canceled = False
+        self.__is_running = False
+        self.__pending = None  # Due time of the coalesced run, or None.
+        self.__next = None  # Future of the next run.
+
+        self.__runs = 0
+        self.__failed = 0
+        self.__skipped = 0
+        self.__coalesced = 0
+        self.__lateness = _stats.Histogram()
+        self.__max_lateness = 0.0
+
+    def _start(self, when):
+        with self.__lock:
+            self.__send_at(when)
+
+    def __send_at(self, when):
+        '''
+        Send the run due at `when' to the pool.
+        This method must be called under the lock.
+        '''
+
+        self.__next = self.__pool.send_at(when, self.__run, when)
+        self.__next._add_callback(self.__check_canceled)
+
+    def __check_canceled(self, future):
+        ''' Cancel this job if the pool canceled the run. '''
+
+        try:
+            future.receive()
+        except error.CancelError:
+            self.cancel()
+
+    def __run(self, due):
+        now = time.time()
+
+        with self.__lock:
+            if self.__is_canceled:
+                return
+
+            if self.__mode == 'fixed_rate':
+                # Runs due before now are missed because the pool is busy.
+                missed = max(int((now - due) // self.__interval), 0)
+                try:
+                    self.__send_at(due + (missed + 1) * self.__interval)
+                except error.DeadPoolError:
+                    self.__is_canceled = True
+            else:
+                missed = 0
+
+            if self.__overlap == 'skip':
+                self.__skipped += missed
+            else:
+                self.__coalesced += missed
+
+            if self.__is_running:
+                if self.__overlap == 'skip':
+                    self.__skipped += 1
+                elif self.__pending is None:
+                    self.__pending = due
+                else:
+                    self.__coalesced += 1
+                return
+
+            self.__is_running = True
+
+        while True:
+            started_at = time.time()
+            try:
+                self.__func(*self.__args, **self.__kwargs)
+                is_error = False
+            except Exception:
+                traceback.print_exc()
+                is_error = True
+            finished_at = time.time()
+
+            with self.__lock:
+                self.__runs += 1
+                self.__failed += is_error
+                lateness = started_at - due
+                self.__lateness.add(lateness)
+                self.__max_lateness = max(self.__max_lateness, lateness)
+
+                if self.__pending is not None and not self.__is_canceled:
+                    # Run the coalesced run at once.
+                    due, self.__pending = self.__pending, None
+                    continue
+
+                self.__is_running = False
+                self.__pending = None
+
+                if self.__mode == 'fixed_delay' and not self.__is_canceled:
+                    try:
+                        self.__send_at(finished_at + self.__interval)
+                    except error.DeadPoolError:
+                        self.__is_canceled = True
+
+                if self.__is_canceled:
+                    break
+                return
+
+        self.__on_cancel(self)
+
+    def cancel(self):
+        '''
+        Cancel the job. The run being done is left unchanged.
+        '''
+
+        with self.__lock:
+            self.__is_canceled = True
+            future, self.__next = self.__next, None
+
+        if future is not None:
+            future.cancel()
+        self.__on_cancel(self)
+
+    def is_canceled(self):
+        ''' Return True if the job is canceled. '''
+
+        return self.__is_canceled
+
+    def stats(self):
+        '''
+        Return dict of the statistics.
+
+          'runs': How many times the callable was run.
+          'failed': How many runs raised an exception.
+          'skipped': How many runs were skipped for overlapping.
+          'coalesced': How many runs were merged into another run.
+          'lateness': Histogram of how many seconds each run started later
+                      than it was due. (See Pool.stats.)
+          'max_lateness': The max of 'lateness'.
+        '''
+
+        with self.__lock:
+            return {'runs': self.__runs, 'failed': self.__failed,
+                    'skipped': self.__skipped,
+                    'coalesced': self.__coalesced,
+                    'lateness': self.__lateness.snapshot(),
+                    'max_lateness': self.__max_lateness}
@@ -16,14 +16,24 @@ limitations under the License.
 '''
 
 
+import inspect
 import threading
 import functools
+import weakref
+
+import rwlock
 
 __MODULE_LOCK = threading.Lock()
 __METHOD_LOCKS = {}
 
+# { id(object): (weakref to the object, RLock) }
+__INSTANCE_LOCKS = {}
+__CLASS_LOCKS = {}
+
+_SCOPES = ('function', 'instance', 'class')
 
-def synchronized(func):
+
+def synchronized(func=None, scope='function', key=None):
     """
     Decorator to restrict from simultaneous access from 2 or more than 2
     threads.
@@ -61,12 +71,94 @@ def synchronized(func):
            @thread_utils.synchronized
            def foo():
                pass
+
+    Argument `scope' specifies which calls are exclusive each other. It is
+    one of the followings.
+
+      'function': Calls of the decorated callable. (Default.)
+      'instance': Calls of the methods decorated with scope='instance' for
+                  the same object. (The 1st argument.)
+      'class': Calls of the methods decorated with scope='class' for the same
+               class. (The 1st argument if it is a class, i.e. classmethod,
+               or the class of it.) Subclasses have their own lock.
+
+    In 'instance' and 'class' scope, the lock is reentrant; a synchronized
+    method can call another one of the same object. The lock is released when
+    the object is garbage collected. The object is requested to be weak
+    referable.
+
+       class Account(object):
+           def __init__(self):
+               self.balance = 0
+
+           @thread_utils.synchronized(scope='instance')
+           def deposit(self, n):
+               self.balance += n
+
+       # Calls for different accounts run in parallel.
+
+    If argument `key' is not None, it is a callable which takes the same
+    arguments as the decorated callable and returns a hashable key. Calls are
+    exclusive only when the keys are equal, and calls with different keys
+    run in parallel. A lock is created for each key being used, and deleted
+    when no thread holds nor waits for it. (The lock is not reentrant.)
+    `key' is available only in 'function' scope.
+
+       @thread_utils.synchronized(key=lambda path, data: path)
+       def append(path, data):
+           with open(path, 'a') as f:
+               f.write(data)
     """
 
     # Argument Check
+    if scope not in _SCOPES:
+        raise ValueError("The argument 'scope' is required to be one of %s." %
+                         (_SCOPES,))
+
+    if key is not None:
+        if not callable(key):
+            raise TypeError("The argument 'key' is required to be callable.")
+        if scope != 'function':
+            raise ValueError("The argument 'key' is available only in "
+                             "'function' scope.")
+
+    if func is None:
+        return lambda f: synchronized(f, scope, key)
+
     if not callable(func):
         raise TypeError("The argument 'func' is required to be callable.")
 
+    if key is not None:
+        locks = _KeyedLocks()
+
+        @functools.wraps(func)
+        def keyed_wrapper(*args, **kwargs):
+            k = key(*args, **kwargs)
+            locks.acquire(k)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                locks.release(k)
+
+        return keyed_wrapper
+
+    if scope == 'instance':
+        @functools.wraps(func)
+        def instance_wrapper(obj, *args, **kwargs):
+            with _lock_of(obj, __INSTANCE_LOCKS):
+                return func(obj, *args, **kwargs)
+
+        return instance_wrapper
+
+    if scope == 'class':
+        @functools.wraps(func)
+        def class_wrapper(obj, *args, **kwargs):
+            cls = obj if inspect.isclass(obj) else obj.__class__
+            with _lock_of(cls, __CLASS_LOCKS):
+                return func(obj, *args, **kwargs)
+
+        return class_wrapper
+
     # Create the method Lock.
     with __MODULE_LOCK:
         if not id(func) in __METHOD_LOCKS:
@@ -80,3 +172,129 @@ def synchronized(func):
             return func(*args, **kwargs)
 
     return wrapper
+
+
+def read_synchronized(lock):
+    """
+    Decorator to call the callable holding thread_utils.RWLock `lock' for
+    reading.
+
+    Callables decorated with read_synchronized(lock) can run at the same time,
+    while callables decorated with write_synchronized(lock) are exclusive each
+    other and with them.
+
+       import thread_utils
+
+       class Cache(object):
+           lock = thread_utils.RWLock()
+
+           def __init__(self):
+               self.data = {}
+
+           @thread_utils.read_synchronized(lock)
+           def get(self, key):
+               return self.data.get(key)
+
+           @thread_utils.write_synchronized(lock)
+           def put(self, key, value):
+               self.data[key] = value
+
+    See help(thread_utils.RWLock) for the details of the lock.
+    """
+
+    return _rw_synchronized(lock, 'reader')
+
+
+def write_synchronized(lock):
+    """
+    Decorator to call the callable holding thread_utils.RWLock `lock' for
+    writing. See help(thread_utils.read_synchronized).
+    """
+
+    return _rw_synchronized(lock, 'writer')
+
+
+def _rw_synchronized(lock, mode):
+    # Argument Check
+    if not isinstance(lock, rwlock.RWLock):
+        raise TypeError("The argument 'lock' is required to be "
+                        "thread_utils.RWLock.")
+
+    guard = getattr(lock, mode)
+
+    def decorator(func):
+        if not callable(func):
+            raise TypeError("The argument 'func' is required to be callable.")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with guard:
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _lock_of(obj, locks):
+    '''
+    Return the RLock related to `obj' in dict `locks'. Create it if necessary.
+    '''
+
+    key = id(obj)
+
+    # Expect for GIL.
+    entry = locks.get(key)
+    if entry is not None and entry[0]() is obj:
+        return entry[1]
+
+    with __MODULE_LOCK:
+        entry = locks.get(key)
+        if entry is None or entry[0]() is not obj:
+            try:
+                # Delete the entry when obj is garbage collected.
+                ref = weakref.ref(obj, lambda r: locks.pop(key, None))
+            except TypeError:
+                raise TypeError("The instance of %s is requested to be weak "
+                                "referable to be synchronized." %
+                                type(obj).__name__)
+
+            entry = (ref, threading.RLock())
+            locks[key] = entry
+
+        return entry[1]
+
+
+class _KeyedLocks(object):
+    '''
+    Table of locks for each key. The lock is created when the key is
+    acquired first, and deleted when no thread holds nor waits for it.
+    '''
+
+    __slots__ = ('__lock', '__locks',)
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        # { key: [Lock, how many threads hold or wait for it] }
+        self.__locks = {}
+
+    def acquire(self, key):
+        with self.__lock:
+            entry = self.__locks.get(key)
+            if entry is None:
+                entry = self.__locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+
+        entry[0].acquire()
+
+    def release(self, key):
+        with self.__lock:
+            entry = self.__locks[key]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.__locks[key]
+
+        entry[0].release()
+
+    def __len__(self):
+        return len(self.__locks)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2014, 2015 Yoshida Shin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+
+import collections
+import threading
+import time
+
+import error
+
+
+FIRST_COMPLETED = 'FIRST_COMPLETED'
+FIRST_EXCEPTION = 'FIRST_EXCEPTION'
+ALL_COMPLETED = 'ALL_COMPLETED'
+
+_RETURN_WHEN = (FIRST_COMPLETED, FIRST_EXCEPTION, ALL_COMPLETED)
+
+
+def wait(futures, timeout=None, return_when=ALL_COMPLETED):
+    """
+    Block until the condition specified by argument `return_when' is
+    satisfied or timeout, and return a pair of sets; the first one is the
+    finished futures and the second one is the others.
+
+    Argument `futures' is an iterable of Future objects created by
+    thread_utils.Pool.send method or callable decorated by thread_utils.async.
+    Argument `return_when' is one of the followings.
+
+      thread_utils.FIRST_COMPLETED: Return when any future is finished.
+      thread_utils.FIRST_EXCEPTION: Return when any future is finished by
+                                    raising an exception or when all futures
+                                    are finished.
+      thread_utils.ALL_COMPLETED:   Return when all futures are finished.
+
+    When argument `timeout' is present and is not None, it should be int or
+    floating number. This function returns in `timeout' seconds even if the
+    condition is not satisfied. (It doesn't raise TimeoutError.)
+
+    Only one waiter is shared by all the futures, so the caller thread wakes
+    up at most once per a finished future.
+    """
+
+    # Argument Check
+    if return_when not in _RETURN_WHEN:
+        raise ValueError("The argument 3 'return_when' is requested to be "
+                         "FIRST_COMPLETED, FIRST_EXCEPTION or ALL_COMPLETED.")
+
+    futures = set(futures)
+    waiter = _Waiter(futures)
+    deadline = None if timeout is None else time.time() + timeout
+
+    done = set()
+    try:
+        while len(done) < len(futures):
+            future = waiter.get(deadline)
+            done.add(future)
+
+            if return_when == FIRST_COMPLETED:
+                break
+            if return_when == FIRST_EXCEPTION and _raised(future):
+                break
+
+    except error.TimeoutError:
+        pass
+
+    finally:
+        waiter.close()
+
+    # Add the futures which have been finished meanwhile.
+    done.update(waiter.get_all())
+    return (done, futures - done)
+
+
+def as_completed(futures, timeout=None):
+    """
+    Return an iterator which yields the Future objects in `futures' in order
+    of finishing.
+
+    When argument `timeout' is present and is not None, it should be int or
+    floating number. The iterator raises TimeoutError if some futures are not
+    finished in `timeout' seconds since this function was called.
+
+      import thread_utils
+
+      with thread_utils.Pool(worker_size=4) as pool:
+          futures = [pool.send(download, url) for url in urls]
+          for future in thread_utils.as_completed(futures):
+              print future.receive()
+    """
+
+    futures = set(futures)
+    deadline = None if timeout is None else time.time() + timeout
+
+    return _iter_completed(futures, deadline)
+
+
+def _iter_completed(futures, deadline):
+    # Register the waiter when the iteration starts so that it is always
+    # unregistered when the iteration is finished or the iterator is closed.
+    waiter = _Waiter(futures)
+    try:
+        for _ in xrange(len(futures)):
+            yield waiter.get(deadline)
+    finally:
+        waiter.close()
+
+
+def gather(futures, timeout=None, return_exceptions=False):
+    """
+    Block until all the futures are finished and return the list of their
+    results in order of argument `futures'.
+
+    If argument `return_exceptions' is False, this function raises the
+    exception as soon as any future is finished by raising it, without waiting
+    for the other futures. Otherwise, the exception is stored in the list
+    instead of the result.
+
+    When argument `timeout' is present and is not None, it should be int or
+    floating number. This function raises TimeoutError if some futures are not
+    finished in `timeout' seconds.
+    """
+
+    futures = list(futures)
+    waiter = _Waiter(set(futures))
+    deadline = None if timeout is None else time.time() + timeout
+
+    try:
+        for _ in xrange(len(waiter)):
+            future = waiter.get(deadline)
+            if not return_exceptions:
+                # Raise the exception if any.
+                future.receive()
+    finally:
+        waiter.close()
+
+    results = []
+    for f in futures:
+        try:
+            results.append(f.receive())
+        except BaseException as e:
+            results.append(e)
+
+    return results
+
+
+def _raised(future):
+    '''
+    Return True if finished `future' raised an exception.
+    '''
+
+    try:
+        future.receive()
+        return False
+    except BaseException:
+        return True
+
+
+class _Waiter(object):
+    '''
+    Shared waiter of some Future objects.
+    It receives each finished future through the callback. close method must
+    be called after used not to leave the callback.
+    '''
+
+    __slots__ = ('__lock', '__finished', '__futures',)
+
+    def __init__(self, futures):
+        self.__lock = threading.Condition(threading.Lock())
+        self.__finished = collections.deque()
+        self.__futures = futures
+
+        for f in futures:
+            f._add_callback(self.__put)
+
+    def close(self):
+        '''
+        Unregister the callback from the futures not finished yet.
+        '''
+
+        for f in self.__futures:
+            f._remove_callback(self.__put)
+
+    def __len__(self):
+        return len(self.__futures)
+
+    def __put(self, future):
+        # Called in the thread which finishes the future.
+        with self.__lock:
+            self.__finished.append(future)
+            self.__lock.notify()
+
+    def get(self, deadline=None):
+        '''
+        Pop a finished future. Block until any future is finished if
+        necessary. Raise TimeoutError if no future is finished before
+        `deadline'.
+        '''
+
+        with self.__lock:
+            while not self.__finished:
+                if deadline is None:
+                    self.__lock.wait()
+                else:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        raise error.TimeoutError
+                    self.__lock.wait(timeout)
+
+            return self.__finished.popleft()
+
+    def get_all(self):
+        '''
+        Pop all the finished futures without blocking.
+        '''
+
+        with self.__lock:
+            ret = list(self.__finished)
+            self.__finished.clear()
+            return ret